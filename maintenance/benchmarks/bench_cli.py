@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from mock_zabbix_server import make_server
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zabbix_add_host_maintenance.py")
+
+# Function to fetch and reset the traffic counters of the mock server
+def fetch_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats?reset=1") as response:
+        return json.loads(response.read())
+
+# Function to run the CLI once and return its wall time and the traffic it caused
+def run_mode(base_url, config_file, cli_args):
+    fetch_stats(base_url)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, SCRIPT, "--config", config_file] + cli_args,
+                               capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    if completed.returncode != 0 or completed.stdout.startswith("Error:"):
+        raise Exception(f"{' '.join(cli_args)} failed: {completed.stdout}{completed.stderr}")
+
+    return elapsed, fetch_stats(base_url)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each CLI mode of zabbix_add_host_maintenance.py against a local mock Zabbix API.")
+    parser.add_argument("--hosts", type=int, default=10000, help="Number of hosts in the mock inventory")
+    parser.add_argument("--groups", type=int, default=20, help="Number of host groups in the mock inventory")
+    parser.add_argument("--latency", type=float, default=20.0, help="Latency added to every HTTP request in milliseconds")
+    parser.add_argument("--host-list-size", type=int, default=300, help="Number of names passed to --host")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode, the fastest is reported")
+    parser.add_argument("--cli-args", default="", help="Extra arguments passed to every run, e.g. --cli-args=--single-call")
+    args = parser.parse_args()
+
+    server = make_server(host_count=args.hosts, group_count=args.groups, latency=args.latency / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    extra_args = shlex.split(args.cli_args)
+    host_names = list(server.api.hosts.values())[:args.host_list_size]
+    group_names = list(server.api.groups.values())[:2]
+    modes = [
+        ("--host list", ["--host", ",".join(host_names), "--time", "1h"]),
+        ("--group", ["--group", ",".join(group_names), "--time", "1h"]),
+        ("--host *", ["--host", "*", "--time", "1h"]),
+        ("--list", ["--list"]),
+        ("--delete", None)
+    ]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as config:
+        config.write(f"[DEFAULT]\nZABBIX_URL={base_url}/api_jsonrpc.php\nAPI_TOKEN=benchmark\n")
+
+    try:
+        print(f"{'mode':<12} {'wall s':>8} {'round trips':>12} {'sent KiB':>10} {'recv KiB':>10}  calls")
+        for name, cli_args in modes:
+            best = None
+            for _ in range(args.repeat):
+                if cli_args is None:
+                    # Delete whatever the previous modes created, recreating it for further runs
+                    if not server.api.maintenances:
+                        run_mode(base_url, config.name, ["--host", host_names[0], "--time", "1h"])
+                    run_args = ["--delete", ",".join(server.api.maintenances)]
+                else:
+                    run_args = cli_args
+                elapsed, stats = run_mode(base_url, config.name, run_args + extra_args)
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, stats)
+
+            elapsed, stats = best
+            calls = ", ".join(f"{method}={count}" for method, count in sorted(stats['calls'].items()))
+            print(f"{name:<12} {elapsed:>8.3f} {stats['requests']:>12} {stats['bytes_in'] / 1024:>10.1f} "
+                  f"{stats['bytes_out'] / 1024:>10.1f}  {calls}")
+    finally:
+        os.unlink(config.name)
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
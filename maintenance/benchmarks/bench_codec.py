@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_zabbix_server import MockZabbix
+from zabbix_add_host_maintenance import JSON_CODECS, build_maintenance_params, load_json_codec
+
+# Function to build realistic request and response bodies with the mock API: a maintenance.create
+# request for every host, and host.get and hostgroup.get responses for the full inventory
+def build_payloads(host_count, group_count):
+    api = MockZabbix(host_count=host_count, group_count=group_count)
+    create = {"jsonrpc": "2.0", "method": "maintenance.create", "id": 1,
+              "params": build_maintenance_params("Maintenance for selected hosts - bench", list(api.hosts), 3600)}
+    requests = [
+        ("maintenance.create request", create)
+    ]
+    responses = [
+        ("host.get response", api.handle({"jsonrpc": "2.0", "method": "host.get", "id": 1,
+                                          "params": {"output": ["hostid", "host"], "selectHostGroups": ["groupid"]}})),
+        ("hostgroup.get response", api.handle({"jsonrpc": "2.0", "method": "hostgroup.get", "id": 1,
+                                               "params": {"output": ["groupid", "name"], "selectHosts": ["hostid", "host"]}}))
+    ]
+    return requests, responses
+
+# Previous behaviour: requests' json= encoding and response.json() decoding, both stdlib json
+def requests_default():
+    return "requests default", lambda obj: json.dumps(obj).encode(), lambda body: json.loads(body.decode())
+
+# Function to return the best time of repeated calls
+def best_time(function, argument, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON codecs on API payloads generated by the mock server.")
+    parser.add_argument("--hosts", type=int, default=100000, help="Number of hosts in the mock inventory")
+    parser.add_argument("--groups", type=int, default=50, help="Number of host groups in the mock inventory")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the fastest is reported")
+    args = parser.parse_args()
+
+    requests, responses = build_payloads(args.hosts, args.groups)
+    codecs = [requests_default()]
+    for name in JSON_CODECS:
+        try:
+            codecs.append(load_json_codec(name))
+        except Exception:
+            print(f"{name}: not installed")
+
+    for payload_name, payload in requests:
+        print(f"{payload_name}, {len(json.dumps(payload)) / 1024:.0f} KiB with stdlib defaults: encode time, size")
+        for name, encode, _ in codecs:
+            elapsed = best_time(encode, payload, args.repeat)
+            print(f"  {name:<17} {elapsed * 1000:>8.1f} ms  {len(encode(payload)) / 1024:>8.0f} KiB")
+
+    for payload_name, payload in responses:
+        body = json.dumps(payload).encode()
+        print(f"{payload_name}, {len(body) / 1024:.0f} KiB: decode time (the client's codecs pause the garbage collector)")
+        for name, _, decode in codecs:
+            elapsed = best_time(decode, body, args.repeat)
+            print(f"  {name:<17} {elapsed * 1000:>8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import HostIndex
+
+# Function to produce (host, hostid) pairs the way host.get returns them, as strings
+def generate_hosts(host_count):
+    for i in range(host_count):
+        yield f"host-{i:06d}.dc{i % 7}.example.com", str(10000 + i)
+
+# Previous representation: a dict of host name to host ID strings
+def build_dict(host_count):
+    return {host: hostid for host, hostid in generate_hosts(host_count)}
+
+def build_index(host_count):
+    return HostIndex(generate_hosts(host_count))
+
+# Function to measure build time, retained and peak traced memory, and lookup time of one representation
+def measure(build, host_count, lookups):
+    tracemalloc.start()
+    start = time.perf_counter()
+    inventory = build(host_count)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for name in lookups:
+        inventory[name]
+    lookup_time = time.perf_counter() - start
+
+    return len(inventory), elapsed, retained, peak, lookup_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory and speed of a host dict and the compact HostIndex.")
+    parser.add_argument("--hosts", type=int, default=100000, help="Number of hosts in the inventory")
+    parser.add_argument("--lookups", type=int, default=10000, help="Number of name lookups timed")
+    args = parser.parse_args()
+
+    names = [host for host, _ in generate_hosts(args.hosts)]
+    lookups = random.Random(1).sample(names, min(args.lookups, len(names)))
+    del names
+
+    for name, build in (("dict", build_dict), ("HostIndex", build_index)):
+        count, elapsed, retained, peak, lookup_time = measure(build, args.hosts, lookups)
+        print(f"{name:>9}: {count} hosts, build {elapsed:.2f}s, retained {retained / 1024 / 1024:.1f} MiB, "
+              f"peak {peak / 1024 / 1024:.1f} MiB, {len(lookups)} lookups {lookup_time * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
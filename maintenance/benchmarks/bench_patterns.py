@@ -0,0 +1,63 @@
+import argparse
+import fnmatch
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import InventoryCache
+
+SITES = ("fra", "ams", "lon", "nyc", "sfo", "sin", "syd")
+ROLES = ("web", "db", "cache", "queue", "lb", "app")
+
+# Function to produce (hostid, host) pairs with realistic role-number-site names
+def generate_hosts(host_count):
+    for i in range(host_count):
+        yield str(10001 + i), f"{ROLES[i % len(ROLES)]}-{i:06d}-{SITES[i // len(ROLES) % len(SITES)]}{i % 3 + 1}.example.com"
+
+# Function to build an inventory cache in a temporary directory, bypassing the API
+def build_inventory(cache_dir, host_count):
+    inventory = InventoryCache("http://bench.invalid/api_jsonrpc.php", cache_dir=cache_dir)
+    with inventory.db:
+        inventory.db.execute("DELETE FROM hosts")
+        inventory.db.executemany("INSERT INTO hosts (hostid, host) VALUES (?, ?)", generate_hosts(host_count))
+    return inventory
+
+# Function to return the best wall time of repeated calls and the number of hosts selected
+def measure(select, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(select())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+def main():
+    parser = argparse.ArgumentParser(description="Time glob and regex host selection from the inventory cache.")
+    parser.add_argument("--hosts", type=int, default=100000, help="Number of hosts in the inventory")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per pattern, the fastest is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        inventory = build_inventory(cache_dir, args.hosts)
+        cases = [
+            ("glob web-01*", lambda: inventory.get_host_ids_by_patterns(["web-01*"])),
+            ("glob web-*-fra*", lambda: inventory.get_host_ids_by_patterns(["web-*-fra*"])),
+            ("glob *-fra1.*", lambda: inventory.get_host_ids_by_patterns(["*-fra1.*"])),
+            ("regex ^db-0\\d*5-", lambda: inventory.get_host_ids_by_patterns([], r"^db-0\d*5-")),
+            # Previous approach: load every host, then match each name
+            ("scan web-*-fra*", lambda: {host: hostid for host, hostid in inventory.get_all_host_ids().items()
+                                         if fnmatch.fnmatchcase(host, "web-*-fra*")})
+        ]
+
+        print(f"{args.hosts} hosts")
+        for name, select in cases:
+            elapsed, count = measure(select, args.repeat)
+            print(f"{name:<20} {elapsed * 1000:>8.1f} ms  {count:>6} hosts")
+        inventory.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zabbix_add_host_maintenance.py")
+
+# Modules that must stay out of the startup path of the CLI
+HEAVY_MODULES = ("requests", "urllib3", "sqlite3", "http.server", "concurrent.futures", "uuid")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# Function to run the CLI under -X importtime and return wall time and {module: (self us, cumulative us)}
+def run_importtime(cli_args):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", SCRIPT] + cli_args,
+                               capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return elapsed, modules
+
+# Function to measure the wall time of plain runs, without import tracing
+def run_wall(cli_args, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT] + cli_args, capture_output=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup time and imports of zabbix_add_host_maintenance.py on the fast paths.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per path, the fastest wall time is reported")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest top-level imports to show per path")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as config:
+        config.write("[DEFAULT]\nZABBIX_URL=http://127.0.0.1:9/api_jsonrpc.php\nAPI_TOKEN=benchmark\n")
+    socket_path = os.path.join(tempfile.gettempdir(), f"bench-startup-{os.getpid()}.sock")
+
+    # The thin client path fails to connect, which is fine: everything up to the socket
+    # connect is what a Zabbix action pays for on every invocation
+    paths = [
+        ("--help", ["--help"]),
+        ("argument error", ["--config", config.name, "--time", "bogus", "--host", "a"]),
+        ("thin client", ["--daemon", socket_path, "--list"])
+    ]
+
+    failed = False
+    try:
+        for name, cli_args in paths:
+            _, modules = run_importtime(cli_args)
+            wall = run_wall(cli_args, args.repeat)
+            total = sum(self_us for self_us, _ in modules.values())
+            heavy = [module for module in HEAVY_MODULES if module in modules]
+            failed = failed or bool(heavy)
+
+            print(f"{name}: wall {wall * 1000:.1f} ms, imports {total / 1000:.1f} ms in {len(modules)} modules, "
+                  f"heavy imports: {', '.join(heavy) or 'none'}")
+            top_level = sorted(((cumulative, module) for module, (_, cumulative) in modules.items() if "." not in module),
+                               reverse=True)[:args.top]
+            for cumulative, module in top_level:
+                print(f"    {module:<24} {cumulative / 1000:>7.1f} ms")
+    finally:
+        os.unlink(config.name)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
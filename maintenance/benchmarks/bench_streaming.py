@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import STREAM_CHUNK_SIZE, iter_json_result
+
+# Function to produce a host.get response body for the given number of hosts in chunks,
+# the way it arrives from the socket
+def generate_response_chunks(host_count):
+    buffer = '{"jsonrpc":"2.0","result":['
+    for i in range(host_count):
+        if i:
+            buffer += ","
+        buffer += json.dumps({"hostid": str(10000 + i), "host": f"host-{i:06d}.dc{i % 7}.example.com"})
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield buffer.encode()
+            buffer = ""
+    yield (buffer + '],"id":1}').encode()
+
+# Current behaviour: read the whole body, decode it into a list of dicts, then build the dict
+def load_full(host_count):
+    body = b"".join(generate_response_chunks(host_count))
+    hosts = json.loads(body)['result']
+    return {host['host']: host['hostid'] for host in hosts}
+
+# Streaming behaviour: hosts go into the dict as they are parsed
+def load_streaming(host_count):
+    return {host['host']: host['hostid'] for host in iter_json_result(generate_response_chunks(host_count))}
+
+# Function to measure wall time and peak traced memory of one loader
+def measure(loader, host_count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loader(host_count)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of full and streaming host.get parsing.")
+    parser.add_argument("--hosts", type=int, default=100000, help="Number of hosts in the simulated response")
+    args = parser.parse_args()
+
+    for name, loader in (("full", load_full), ("streaming", load_streaming)):
+        count, elapsed, peak = measure(loader, args.hosts)
+        print(f"{name:>9}: {count} hosts, {elapsed:.2f}s, peak memory {peak / 1024 / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
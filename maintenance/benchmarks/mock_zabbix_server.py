@@ -0,0 +1,345 @@
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Zabbix JSON-RPC API, covering the methods used by
+# zabbix_add_host_maintenance.py, with injected latency and failures and traffic counters
+
+# Function to keep only the requested fields of an object ("extend" keeps everything)
+def select_fields(obj, output):
+    if output == "extend" or output is None:
+        return dict(obj)
+    return {key: value for key, value in obj.items() if key in output}
+
+# Function to build the matcher of an API "search" value: case-insensitive LIKE '%value%',
+# or 'value%' with startSearch, where * is a wildcard if searchWildcardsEnabled is set
+def search_matcher(value, params):
+    pattern = re.escape(value)
+    if params.get("searchWildcardsEnabled"):
+        pattern = pattern.replace(r"\*", ".*")
+    if not params.get("startSearch"):
+        pattern = ".*" + pattern
+    return re.compile(pattern, re.IGNORECASE).match
+
+# Function to check an object against the "search" parameter of a get request
+def matches_search(obj, params):
+    results = []
+    for field, values in params.get("search", {}).items():
+        for value in values if isinstance(values, list) else [values]:
+            results.append(search_matcher(value, params)(obj.get(field, "")) is not None)
+    if not results:
+        return True
+    return any(results) if params.get("searchByAny") else all(results)
+
+# Tag filter operators: contains, equals, not like, not equal, exists, not exists
+TAG_OPERATORS = {
+    0: lambda values, value: any(value.lower() in v.lower() for v in values),
+    1: lambda values, value: value in values,
+    2: lambda values, value: not any(value.lower() in v.lower() for v in values),
+    3: lambda values, value: value not in values,
+    4: lambda values, value: bool(values),
+    5: lambda values, value: not values
+}
+
+# Function to check host tags against the "tags" and "evaltype" parameters of host.get.
+# evaltype 0 (And/Or) ORs filters on the same tag name and ANDs the names, 2 (Or) ORs everything.
+def matches_tags(tags, params):
+    filters = params.get("tags")
+    if not filters:
+        return True
+
+    by_name = {}
+    for tag_filter in filters:
+        values = [tag['value'] for tag in tags if tag['tag'] == tag_filter['tag']]
+        result = TAG_OPERATORS[int(tag_filter.get("operator", 0))](values, tag_filter.get("value", ""))
+        by_name[tag_filter['tag']] = by_name.get(tag_filter['tag'], False) or result
+
+    if int(params.get("evaltype", 0)) == 2:
+        return any(by_name.values())
+    return all(by_name.values())
+
+class ApiError(Exception):
+    pass
+
+# In-memory inventory and maintenance store
+class MockZabbix:
+    def __init__(self, host_count=1000, group_count=10):
+        self.lock = threading.Lock()
+        self.groups = {str(i + 1): f"Group {i + 1}" for i in range(group_count)}
+        self.hosts = {str(10001 + i): f"host-{i:06d}.example.com" for i in range(host_count)}
+        # Every host has an env, site and role tag
+        self.tags = {hostid: [{"tag": "env", "value": "staging" if i % 4 == 0 else "prod"},
+                              {"tag": "site", "value": ("fra", "ams", "lon")[i % 3]},
+                              {"tag": "role", "value": ("web", "db", "cache", "queue", "lb")[i % 5]}]
+                     for i, hostid in enumerate(self.hosts)}
+        # Every host is in one group, every tenth host is also in the next one
+        self.members = {groupid: set() for groupid in self.groups}
+        for i, hostid in enumerate(self.hosts):
+            self.members[str(i % group_count + 1)].add(hostid)
+            if i % 10 == 0:
+                self.members[str((i + 1) % group_count + 1)].add(hostid)
+        self.maintenances = {}
+        self.next_maintenance_id = 1
+        self.auditlog = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "calls": {}, "bytes_in": 0, "bytes_out": 0, "failures": 0}
+
+    def record_call(self, method):
+        self.stats['calls'][method] = self.stats['calls'].get(method, 0) + 1
+
+    def host_groups(self, hostid):
+        return [{"groupid": groupid, "name": self.groups[groupid]}
+                for groupid, members in self.members.items() if hostid in members]
+
+    def host_get(self, params):
+        hostids = params.get("hostids")
+        names = params.get("filter", {}).get("host")
+        names = set(names) if names is not None else None
+        if hostids is not None:
+            hostids = set(hostids)
+        if params.get("groupids") is not None:
+            members = set()
+            for groupid in params['groupids']:
+                members |= self.members.get(groupid, set())
+            hostids = members if hostids is None else hostids & members
+
+        hosts = []
+        for hostid, name in self.hosts.items():
+            if hostids is not None and hostid not in hostids:
+                continue
+            if names is not None and name not in names:
+                continue
+            if not matches_search({"host": name}, params):
+                continue
+            if not matches_tags(self.tags[hostid], params):
+                continue
+            host = select_fields({"hostid": hostid, "host": name}, params.get("output"))
+            if "selectTags" in params:
+                host['tags'] = [dict(tag) for tag in self.tags[hostid]]
+            if "selectHostGroups" in params:
+                host['hostgroups'] = [select_fields(group, params['selectHostGroups']) for group in self.host_groups(hostid)]
+            hosts.append(host)
+        return hosts
+
+    def hostgroup_get(self, params):
+        names = params.get("filter", {}).get("name")
+        groupids = params.get("groupids")
+        groups = []
+        for groupid, name in self.groups.items():
+            if names is not None and name not in names:
+                continue
+            if groupids is not None and groupid not in groupids:
+                continue
+            group = select_fields({"groupid": groupid, "name": name}, params.get("output"))
+            if "selectHosts" in params:
+                group['hosts'] = [select_fields({"hostid": hostid, "host": self.hosts[hostid]}, params['selectHosts'])
+                                  for hostid in sorted(self.members[groupid])]
+            groups.append(group)
+        return groups
+
+    def maintenance_create(self, params):
+        maintenanceids = []
+        for maintenance in params if isinstance(params, list) else [params]:
+            if any(existing['name'] == maintenance['name'] for existing in self.maintenances.values()):
+                raise ApiError(f"Maintenance \"{maintenance['name']}\" already exists.")
+            maintenanceid = str(self.next_maintenance_id)
+            self.next_maintenance_id += 1
+            self.maintenances[maintenanceid] = {
+                "maintenanceid": maintenanceid,
+                "name": maintenance['name'],
+                "description": maintenance.get("description", ""),
+                "active_since": str(maintenance['active_since']),
+                "active_till": str(maintenance['active_till']),
+                "hostids": [str(hostid) for hostid in maintenance.get("hostids", [])],
+                "groupids": [str(groupid) for groupid in maintenance.get("groupids", [])],
+                "timeperiods": [dict({"start_date": str(maintenance['active_since'])}, **period)
+                                for period in maintenance.get("timeperiods", [])]
+            }
+            maintenanceids.append(maintenanceid)
+        return {"maintenanceids": maintenanceids}
+
+    def maintenance_update(self, params):
+        maintenance = self.maintenances.get(params['maintenanceid'])
+        if maintenance is None:
+            raise ApiError("No permissions to referred object or it does not exist!")
+        for key, value in params.items():
+            maintenance[key] = str(value) if key in ("active_since", "active_till") else value
+        return {"maintenanceids": [params['maintenanceid']]}
+
+    def maintenance_get(self, params):
+        maintenances = list(self.maintenances.values())
+        if params.get("maintenanceids") is not None:
+            maintenances = [m for m in maintenances if m['maintenanceid'] in params['maintenanceids']]
+        if params.get("hostids") is not None:
+            maintenances = [m for m in maintenances if set(m['hostids']) & set(params['hostids'])]
+        if params.get("groupids") is not None:
+            maintenances = [m for m in maintenances if set(m['groupids']) & set(params['groupids'])]
+        for field, values in params.get("filter", {}).items():
+            values = [str(value) for value in (values if isinstance(values, list) else [values])]
+            maintenances = [m for m in maintenances if m.get(field) in values]
+        maintenances = [m for m in maintenances if matches_search(m, params)]
+
+        sortfield = params.get("sortfield", "maintenanceid")
+        maintenances.sort(key=lambda m: int(m[sortfield]) if m[sortfield].isdigit() else m[sortfield],
+                          reverse=params.get("sortorder") == "DESC")
+        if params.get("limit"):
+            maintenances = maintenances[:int(params['limit'])]
+
+        result = []
+        for maintenance in maintenances:
+            item = select_fields({key: value for key, value in maintenance.items() if key not in ("hostids", "groupids", "timeperiods")},
+                                 params.get("output"))
+            if "selectTimeperiods" in params:
+                item['timeperiods'] = maintenance['timeperiods']
+            if "selectHosts" in params:
+                item['hosts'] = [{"hostid": hostid} for hostid in maintenance['hostids']]
+            if "selectHostGroups" in params:
+                item['hostgroups'] = [{"groupid": groupid} for groupid in maintenance['groupids']]
+            result.append(item)
+        return result
+
+    def maintenance_delete(self, params):
+        missing = [maintenanceid for maintenanceid in params if maintenanceid not in self.maintenances]
+        if missing:
+            raise ApiError("No permissions to referred object or it does not exist!")
+        for maintenanceid in params:
+            del self.maintenances[maintenanceid]
+        return {"maintenanceids": params}
+
+    def auditlog_get(self, params):
+        resource_types = params.get("filter", {}).get("resourcetype")
+        records = [record for record in self.auditlog
+                   if record['clock'] >= int(params.get("time_from", 0))
+                   and (resource_types is None or record['resourcetype'] in resource_types)]
+        if params.get("limit"):
+            records = records[:int(params['limit'])]
+        return [{key: str(value) for key, value in record.items()} for record in records]
+
+    def apiinfo_version(self, params):
+        return "7.0.0"
+
+    # Dispatch one JSON-RPC request object and build its response object
+    def handle(self, request):
+        method = request.get("method", "")
+        handler = getattr(self, method.replace(".", "_"), None)
+        with self.lock:
+            self.record_call(method)
+            try:
+                if handler is None:
+                    raise ApiError(f"Incorrect method \"{method}\".")
+                return {"jsonrpc": "2.0", "result": handler(request.get("params", {})), "id": request.get("id")}
+            except (ApiError, KeyError, TypeError, ValueError) as e:
+                return {"jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid params.", "data": str(e)},
+                        "id": request.get("id")}
+
+class MockZabbixHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, body, status=200, encoding=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        api = self.server.api
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with api.lock:
+            api.stats['requests'] += 1
+            api.stats['bytes_in'] += len(body)
+
+        # Overloaded frontend: the request is rejected before reaching the API
+        if random.random() < self.server.error_rate:
+            with api.lock:
+                api.stats['failures'] += 1
+            self.send_body(b"<html>502 Bad Gateway</html>", status=502)
+            return
+
+        # Like Apache with "SetInputFilter DEFLATE" when started with --gzip, like a plain
+        # PHP frontend otherwise: a compressed body is not valid JSON
+        if self.server.compression and self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.send_body(json.dumps({"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error.",
+                                                                   "data": "Invalid JSON. An error occurred on the server while parsing the JSON text."},
+                                       "id": None}).encode())
+            return
+        if isinstance(request, list):
+            response = [api.handle(item) for item in request]
+        else:
+            response = api.handle(request)
+        response_body = json.dumps(response).encode()
+
+        # Gateway timeout after the API already applied the request
+        if random.random() < self.server.lost_response_rate:
+            with api.lock:
+                api.stats['failures'] += 1
+            self.send_body(b"<html>504 Gateway Timeout</html>", status=504)
+            return
+
+        encoding = None
+        if self.server.compression and "gzip" in self.headers.get("Accept-Encoding", ""):
+            response_body = gzip.compress(response_body, 6)
+            encoding = "gzip"
+
+        with api.lock:
+            api.stats['bytes_out'] += len(response_body)
+        self.send_body(response_body, encoding=encoding)
+
+    # GET /stats returns the traffic counters, GET /stats?reset=1 also clears them
+    def do_GET(self):
+        api = self.server.api
+        with api.lock:
+            body = json.dumps(api.stats).encode()
+            if self.path.endswith("reset=1"):
+                api.reset_stats()
+        self.send_body(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to create a mock server; call serve_forever() on the result
+def make_server(host="127.0.0.1", port=0, host_count=1000, group_count=10, latency=0.0,
+                error_rate=0.0, lost_response_rate=0.0, compression=False):
+    server = ThreadingHTTPServer((host, port), MockZabbixHandler)
+    server.daemon_threads = True
+    server.api = MockZabbix(host_count=host_count, group_count=group_count)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.lost_response_rate = lost_response_rate
+    server.compression = compression
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock Zabbix JSON-RPC API.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--hosts", type=int, default=1000, help="Number of hosts in the inventory")
+    parser.add_argument("--groups", type=int, default=10, help="Number of host groups")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latency added to every HTTP request in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests rejected with 502 before processing")
+    parser.add_argument("--lost-response-rate", type=float, default=0.0, help="Fraction of requests answered with 504 after processing")
+    parser.add_argument("--gzip", action="store_true", help="Accept gzip request bodies and gzip responses to clients accepting it")
+    args = parser.parse_args()
+
+    server = make_server(port=args.port, host_count=args.hosts, group_count=args.groups, latency=args.latency / 1000,
+                         error_rate=args.error_rate, lost_response_rate=args.lost_response_rate, compression=args.gzip)
+    print(f"Mock Zabbix API listening on http://127.0.0.1:{server.server_address[1]}/api_jsonrpc.php")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
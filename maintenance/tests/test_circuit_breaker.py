@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import CircuitBreaker, ZabbixClient
+
+class FakeResponse:
+    status_code = 200
+    content = b'{"jsonrpc":"2.0","result":[],"id":1}'
+
+    def close(self):
+        pass
+
+# Function to build a client whose session answers with the given outcomes in turn
+def make_client(outcomes):
+    client = ZabbixClient("http://zabbix.invalid/api_jsonrpc.php", "token", retries=0,
+                          breaker=CircuitBreaker(threshold=1, timeout=0))
+
+    def post(*args, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    client.session.post = post
+    return client
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ChunkedEncodingError("truncated"),
+    requests.exceptions.ContentDecodingError("bad gzip"),
+    requests.exceptions.InvalidHeader("bad header"),
+    ValueError("unexpected")
+])
+def test_failed_trial_call_does_not_keep_the_breaker_open(error):
+    client = make_client([requests.exceptions.ConnectionError("refused"), error, FakeResponse()])
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post("host.get", b"{}", True)
+    with pytest.raises(type(error)):
+        client.post("host.get", b"{}", True)
+
+    response, retries = client.post("host.get", b"{}", True)
+    assert response.status_code == 200
+    assert not client.breaker.trial_running
+    assert client.breaker.opened_at is None
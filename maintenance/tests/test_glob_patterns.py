@@ -0,0 +1,49 @@
+import fnmatch
+import os
+import re
+import sys
+import warnings
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import glob_line_regex, glob_search_pattern
+
+NAMES = [
+    "web-01.example.com", "web-02.example.com", "web-10.example.com", "db-01.example.com",
+    "a]b", "a!b", "a[b", "axb", "a-b", "a^b", "a\\b", "a&b", "a|b", "a~b",
+    "x[1]", "x11", "x[", "x]", "[web]", "café-01", "ümlaut.example.com", ""
+]
+
+PATTERNS = [
+    "*", "web-*", "web-0?.example.com", "*-01*", "web-[01]*", "web-[!0]*", "web-[0-1]?.example.com",
+    "a[!]]b", "a[]]b", "a[]!]b", "a[!!]b", "x[[]1]", "x[[]*", "a[\\]b", "a[^]b", "a[!^]b",
+    "a[&&]b", "a[|~]b", "a[-]b", "a[a-]b", "[[]web]", "x[", "x]", "a[b", "a[!b", "a[]b",
+    "caf?-01", "[!a-z]mlaut*", "?"
+]
+
+# Function to check a name against a glob the way HostIndex.match runs it
+def line_match(pattern, name):
+    return re.search(glob_line_regex(pattern), name, re.MULTILINE) is not None
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_glob_line_regex_matches_like_fnmatch(pattern):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for name in NAMES:
+            assert line_match(pattern, name) == fnmatch.fnmatchcase(name, pattern), name
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_glob_line_regex_stays_on_one_name(pattern):
+    names = "\n".join(NAMES) + "\n"
+    for found in re.finditer(glob_line_regex(pattern), names, re.MULTILINE):
+        assert "\n" not in found.group()
+
+# The API search is case-insensitive, anchored at the start with startSearch and * is its only wildcard
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_glob_search_pattern_keeps_every_match(pattern):
+    search = re.compile(".*".join(re.escape(part) for part in glob_search_pattern(pattern).split("*")), re.IGNORECASE)
+    for name in NAMES:
+        if fnmatch.fnmatchcase(name, pattern):
+            assert search.match(name), name
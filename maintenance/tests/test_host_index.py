@@ -0,0 +1,89 @@
+import fnmatch
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import HostIndex
+
+HOSTS = [
+    ("web-01.example.com", "10001"), ("web-02.example.com", "10002"), ("db-01.example.com", "10003"),
+    ("café-01.example.com", "10004"), ("ümlaut-01", "10005"), ("日本-01.example.jp", "10006"),
+    ("a]b", "10007"), ("x[1]", "10008")
+]
+
+def test_lookup_and_mapping_views():
+    index = HostIndex(HOSTS)
+    assert len(index) == len(HOSTS)
+    assert list(index) == [name for name, _ in HOSTS]
+    assert index.values() == [hostid for _, hostid in HOSTS]
+    assert dict(index.items()) == dict(HOSTS)
+    for name, hostid in HOSTS:
+        assert index[name] == hostid
+        assert name in index
+    assert "web-03.example.com" not in index
+    with pytest.raises(KeyError):
+        index["web-0"]
+
+def test_non_ascii_names_keep_their_boundaries():
+    index = HostIndex(HOSTS)
+    assert index["日本-01.example.jp"] == "10006"
+    assert index["ümlaut-01"] == "10005"
+    assert "café" not in index
+    assert list(index.match(["caf?-01*"])) == ["café-01.example.com"]
+
+def test_duplicates_keep_the_first_host_id():
+    index = HostIndex(HOSTS + [("web-01.example.com", "20001"), ("ümlaut-01", "20005")])
+    assert len(index) == len(HOSTS)
+    assert list(index) == [name for name, _ in HOSTS]
+    assert index["web-01.example.com"] == "10001"
+    assert index["ümlaut-01"] == "10005"
+    assert index["a]b"] == "10007"
+
+def test_empty_index():
+    index = HostIndex()
+    assert len(index) == 0
+    assert list(index) == []
+    assert index.values() == []
+    assert "web-01.example.com" not in index
+    with pytest.raises(Exception, match="No hosts match"):
+        index.match(["*"])
+    with pytest.raises(Exception, match="No hosts match"):
+        index.match([], re.compile(""))
+
+# Enough names to fill the table to its load limit and exercise the linear probing
+def test_many_names():
+    hosts = [(f"host-{i:06d}", str(10000 + i)) for i in range(5000)]
+    index = HostIndex(hosts)
+    assert all(index[name] == hostid for name, hostid in hosts)
+    assert "host-005000" not in index
+
+@pytest.mark.parametrize("pattern", [
+    "*", " *", "web-*", "*-01*", "web-0[12].example.com", "[!w]*", "a[!]]b", "a[]]b", "x[[]1]",
+    "??????-01*", "日本*", "*.example.*"
+])
+def test_match_globs_like_fnmatch(pattern):
+    index = HostIndex(HOSTS)
+    expected = [name for name, _ in HOSTS if fnmatch.fnmatchcase(name, pattern)]
+    if not expected:
+        with pytest.raises(Exception, match="No hosts match"):
+            index.match([pattern])
+        return
+    matched = index.match([pattern])
+    assert list(matched) == expected
+    assert matched.values() == [dict(HOSTS)[name] for name in expected]
+
+def test_match_combines_globs_and_regex_in_index_order():
+    index = HostIndex(HOSTS)
+    matched = index.match(["db-*", "*", "web-01*"], re.compile(r"\.jp$"))
+    assert list(matched) == [name for name, _ in HOSTS]
+    matched = index.match(["db-*"], re.compile(r"^web-02"))
+    assert list(matched) == ["web-02.example.com", "db-01.example.com"]
+
+def test_match_reports_every_unmatched_pattern():
+    index = HostIndex(HOSTS)
+    with pytest.raises(Exception, match="No hosts match: nope-\\*, \\^none"):
+        index.match(["web-*", "nope-*"], re.compile("^none"))
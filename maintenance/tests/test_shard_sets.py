@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zabbix_add_host_maintenance import MAINTENANCE_NAME_PREFIX, group_shard_sets
+
+# Function to build a maintenance.get row, a shard of a set if set_id is given
+def task(maintenance_id, set_id=None, shard=1, total=1):
+    if set_id:
+        name = f"{MAINTENANCE_NAME_PREFIX}{set_id} shard {shard}/{total}"
+    else:
+        name = f"{MAINTENANCE_NAME_PREFIX}Maintenance ID:{maintenance_id}"
+    return {"maintenanceid": maintenance_id, "name": name, "active_since": "1000", "active_till": "4600"}
+
+# Function to reduce grouped entries to comparable values
+def summary(entries):
+    return [(entry['set_id'], entry['maintenanceids']) if 'set_id' in entry else entry['maintenanceid']
+            for entry in entries]
+
+def test_interleaved_sets_are_listed_as_units():
+    tasks = [task("1"), task("3", "a", 1, 3), task("2", "b", 2, 2), task("5", "a", 3, 3), task("4", "b", 1, 2),
+             task("6"), task("7", "a", 2, 3)]
+    assert summary(group_shard_sets(tasks)) == ["1", ("a", ["3", "5", "7"]), ("b", ["2", "4"]), "6"]
+
+def test_complete_entries_are_yielded_before_the_stream_ends():
+    def tasks():
+        yield task("1")
+        yield task("2", "a", 1, 2)
+        yield task("3", "a", 2, 2)
+        yield task("4", "b", 1, 2)
+        raise AssertionError("read past the complete entries")
+
+    grouped = group_shard_sets(tasks())
+    assert summary([next(grouped), next(grouped)]) == ["1", ("a", ["2", "3"])]
+
+def test_incomplete_sets_are_yielded_at_the_end():
+    tasks = [task("1", "a", 1, 3), task("2"), task("3", "a", 3, 3)]
+    assert summary(group_shard_sets(tasks)) == [("a", ["1", "3"]), "2"]
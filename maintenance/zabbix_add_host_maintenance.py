@@ -1,9 +1,101 @@
-import requests
 import time
 import argparse
 import re
 import configparser
+import itertools
+import json
 import os
+import sys
+import threading
+from collections.abc import Mapping
+
+# Only cheap modules are imported at startup, since the script is spawned in bursts from
+# Zabbix actions. requests, sqlite3, the HTTP server modules and friends are imported in the
+# code paths that use them, so --help, argument errors and the thin client stay fast.
+
+# Default number of keep-alive connections kept in the session pool
+DEFAULT_POOL_SIZE = 4
+
+# Default (connect, read) timeouts in seconds for API calls
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+# Default retry policy: attempts after the first one and exponential backoff bounds in seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 10
+
+# HTTP statuses worth retrying, and the subset where the request never reached the API
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+NOT_PROCESSED_STATUS_CODES = {429, 503}
+
+# Default circuit breaker: consecutive failures that open it and seconds before a trial call
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_TIMEOUT = 30
+
+# Default location and lifetime in seconds of the local host inventory cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "zabbix-maintenance")
+DEFAULT_CACHE_TTL = 3600
+
+# Incremental sync falls back to a full download when the last sync is older than this
+DEFAULT_MAX_SYNC_GAP = 7 * 86400
+
+# Maximum number of audit log records applied incrementally before falling back to a full download
+AUDITLOG_LIMIT = 10000
+
+# Seconds subtracted from the last sync time to cover clock skew with the Zabbix server
+SYNC_CLOCK_SLACK = 60
+
+# Audit log resource types and actions relevant to the inventory
+AUDIT_RESOURCE_HOST = 4
+AUDIT_RESOURCE_HOST_GROUP = 14
+AUDIT_ACTION_DELETE = 2
+
+# Size of the chunks read from streamed API responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Request bodies smaller than this are sent uncompressed with --compress-requests,
+# gzip would not save a round trip's worth of bytes
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+
+# JSON-RPC error code of a request body the API could not parse
+JSON_RPC_PARSE_ERROR = -32700
+
+# Upper bounds in seconds of the API call latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Default Zabbix trapper port used to push the client statistics
+DEFAULT_TRAPPER_PORT = 10051
+
+# Name prefix shared by every maintenance created by this script
+MAINTENANCE_NAME_PREFIX = "Maintenance for selected hosts - "
+
+# Shards of one logical maintenance are named "<prefix><set ID> shard <n>/<total>"
+SHARD_NAME_PATTERN = re.compile(re.escape(MAINTENANCE_NAME_PREFIX) + r"(?P<set_id>\S+) shard (?P<shard>\d+)/(?P<total>\d+)$")
+
+# Default number of maintenance shards created in parallel
+DEFAULT_CONCURRENCY = 4
+
+# Default number of maintenance IDs sent in a single maintenance.delete call
+DEFAULT_DELETE_CHUNK_SIZE = 500
+
+# JSON codecs in order of preference, the first installed one is used by default
+JSON_CODECS = ("orjson", "ujson", "json")
+
+# host.get tag filtering: evaltype And/Or (tags of different names must all match) and Or,
+# and the operators for "key=value" (equals) and a bare "key" (exists)
+TAG_EVAL_AND_OR = 0
+TAG_EVAL_OR = 2
+TAG_OPERATOR_EQUALS = 1
+TAG_OPERATOR_EXISTS = 4
+
+# Recurring maintenance: timeperiod types of --every, weekday bits of "dayofweek" (Monday = 1),
+# all twelve bits of "month", and the latest active_till the API accepts
+SCHEDULE_TIMEPERIOD_TYPES = {"daily": 2, "weekly": 3, "monthly": 4}
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+ALL_MONTHS = 0xFFF
+ZBX_MAX_DATE = 2147483647
 
 # Load Zabbix configuration from the specified config file
 def load_zabbix_config(config_file):
@@ -18,6 +110,655 @@ def load_zabbix_config(config_file):
 
     return zabbix_url, api_token
 
+# Function to incrementally parse a JSON-RPC response arriving as byte chunks and yield the
+# elements of its "result" array one by one, so the full body never has to be held in memory
+def iter_json_result(chunks):
+    import codecs
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+
+    # Append the next chunk to the unconsumed part of the buffer
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            if eof:
+                raise Exception("Truncated JSON-RPC response")
+            eof = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+
+    # Return the next non-whitespace character without consuming it
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            read_more()
+
+    # Decode the next complete JSON value. A value is only accepted when followed by a
+    # delimiter (or at EOF), since a number cut by the chunk boundary still parses.
+    def decode_value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if (end < len(buffer) and buffer[end] in " \t\r\n,:]}") or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise Exception(f"Unexpected character {buffer[pos]!r} in JSON-RPC response")
+        pos += 1
+
+    envelope = {}
+    expect("{")
+    while peek() != "}":
+        key = decode_value()
+        expect(":")
+        if key == "result" and peek() == "[":
+            pos += 1
+            while peek() != "]":
+                yield decode_value()
+                if peek() == ",":
+                    pos += 1
+            pos += 1
+            envelope[key] = None
+        else:
+            envelope[key] = decode_value()
+        if peek() == ",":
+            pos += 1
+
+    if "error" in envelope:
+        raise Exception(envelope['error']['data'])
+    if "result" not in envelope:
+        raise Exception("JSON-RPC response without result")
+
+# Load the optional settings for pushing client statistics to Zabbix trapper items
+def load_trapper_config(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    server = config.get('DEFAULT', 'ZABBIX_SERVER', fallback=None)
+    port = config.getint('DEFAULT', 'ZABBIX_SERVER_PORT', fallback=DEFAULT_TRAPPER_PORT)
+    stats_host = config.get('DEFAULT', 'STATS_HOST', fallback=None)
+
+    if not server or not stats_host:
+        raise Exception("ZABBIX_SERVER and STATS_HOST must be set in the config file to push statistics")
+
+    return server, port, stats_host
+
+# Per-method latency histograms and traffic, retry and error counters of API calls
+class ClientStats:
+    def __init__(self, call_log=None):
+        self.lock = threading.Lock()
+        self.methods = {}
+        self.call_log = call_log
+
+    def method_stats(self, method):
+        if method not in self.methods:
+            self.methods[method] = {
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "wire_bytes_sent": 0,
+                "wire_bytes_received": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+            }
+        return self.methods[method]
+
+    # bytes_sent and bytes_received are JSON sizes, the wire sizes default to them for
+    # uncompressed bodies. With a call_log every call is also reported as one line.
+    def record(self, method, elapsed, bytes_sent=0, bytes_received=0, error=False,
+               wire_bytes_sent=None, wire_bytes_received=None):
+        wire_bytes_sent = bytes_sent if wire_bytes_sent is None else wire_bytes_sent
+        wire_bytes_received = bytes_received if wire_bytes_received is None else wire_bytes_received
+        with self.lock:
+            stats = self.method_stats(method)
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['bytes_sent'] += bytes_sent
+            stats['bytes_received'] += bytes_received
+            stats['wire_bytes_sent'] += wire_bytes_sent
+            stats['wire_bytes_received'] += wire_bytes_received
+            stats['latency_total'] += elapsed
+            stats['latency_max'] = max(stats['latency_max'], elapsed)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+            stats['latency_buckets'][bucket] += 1
+
+        if self.call_log:
+            self.call_log(f"API call {method}: {elapsed * 1000:.1f} ms, "
+                          f"sent {bytes_sent / 1024:.1f} KiB ({wire_bytes_sent / 1024:.1f} KiB on the wire), "
+                          f"received {bytes_received / 1024:.1f} KiB ({wire_bytes_received / 1024:.1f} KiB on the wire)"
+                          f"{', failed' if error else ''}")
+
+    def record_retry(self, method):
+        with self.lock:
+            self.method_stats(method)['retries'] += 1
+
+    # Statistics as a JSON-serialisable dict with cumulative histogram buckets
+    def as_dict(self):
+        with self.lock:
+            result = {}
+            for method, stats in sorted(self.methods.items()):
+                buckets = {}
+                count = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), stats['latency_buckets']):
+                    count += bucket_count
+                    buckets[str(bound)] = count
+                result[method] = {
+                    "calls": stats['calls'],
+                    "errors": stats['errors'],
+                    "retries": stats['retries'],
+                    "bytes_sent": stats['bytes_sent'],
+                    "bytes_received": stats['bytes_received'],
+                    "wire_bytes_sent": stats['wire_bytes_sent'],
+                    "wire_bytes_received": stats['wire_bytes_received'],
+                    "latency_avg": round(stats['latency_total'] / stats['calls'], 6) if stats['calls'] else 0.0,
+                    "latency_max": round(stats['latency_max'], 6),
+                    "latency_buckets": buckets
+                }
+            return result
+
+    # Push the statistics as trapper item values "zabbix_maintenance.<metric>[<method>]"
+    # using the Zabbix sender protocol, returns the server's response info
+    def send_to_trapper(self, server, port, stats_host):
+        import socket
+        import struct
+
+        clock = int(time.time())
+        data = [{"host": stats_host, "key": f"zabbix_maintenance.{metric}[{method}]", "value": str(value), "clock": clock}
+                for method, stats in self.as_dict().items()
+                for metric, value in stats.items() if metric != "latency_buckets"]
+
+        body = json.dumps({"request": "sender data", "data": data}).encode()
+        with socket.create_connection((server, port), timeout=DEFAULT_CONNECT_TIMEOUT) as connection:
+            connection.sendall(b"ZBXD\x01" + struct.pack("<II", len(body), 0) + body)
+            header = connection.recv(13, socket.MSG_WAITALL)
+            if len(header) < 13 or not header.startswith(b"ZBXD"):
+                raise Exception(f"Unexpected response from Zabbix trapper {server}:{port}")
+            length = struct.unpack("<I", header[5:9])[0]
+            response = json.loads(connection.recv(length, socket.MSG_WAITALL))
+
+        if response.get("response") != "success":
+            raise Exception(f"Zabbix trapper rejected statistics: {response}")
+
+        return response.get("info", "")
+
+# Stops calls to a failing frontend after a run of consecutive failures, letting a single
+# trial call through once the timeout has passed
+class CircuitBreaker:
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, timeout=DEFAULT_BREAKER_TIMEOUT):
+        self.threshold = threshold
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    # Raise instead of calling the API while the breaker is open
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.timeout - time.monotonic()
+            if remaining > 0 or self.trial_running:
+                raise Exception(f"Zabbix API failed {self.failures} times in a row, "
+                                f"not calling it for another {max(remaining, 0):.1f}s")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+# Function to wrap a JSON decoder so the cyclic garbage collector is paused while it runs.
+# A large response allocates so many containers that collections would run over and over,
+# costing more than the parsing itself, and decoded JSON cannot form reference cycles.
+def gc_paused(decode):
+    import gc
+
+    def decode_paused(body):
+        if not gc.isenabled():
+            return decode(body)
+        gc.disable()
+        try:
+            return decode(body)
+        finally:
+            gc.enable()
+
+    return decode_paused
+
+# Function to load a JSON codec as (name, encode to UTF-8 bytes, decode from bytes), using the
+# fastest installed library or the one named. Encoding is compact with every codec.
+def load_json_codec(name=None):
+    for candidate in [name] if name else JSON_CODECS:
+        if candidate == "orjson":
+            try:
+                import orjson
+            except ImportError:
+                continue
+            return "orjson", orjson.dumps, gc_paused(orjson.loads)
+
+        if candidate == "ujson":
+            try:
+                import ujson
+            except ImportError:
+                continue
+            return "ujson", lambda obj: ujson.dumps(obj, ensure_ascii=False).encode(), gc_paused(ujson.loads)
+
+        if candidate == "json":
+            return ("json", lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(),
+                    gc_paused(json.loads))
+
+    raise Exception(f"JSON codec {name} is not installed")
+
+# Function to check whether a method can be repeated without changing the outcome.
+# maintenance.create counts as idempotent because names are unique: a repeated create
+# fails with "already exists" and is then resolved to the existing maintenance.
+def is_idempotent(method):
+    return method.endswith(".get") or method in ("apiinfo.version", "maintenance.update", "maintenance.create")
+
+# Function to check whether a failed request certainly never reached the API
+def is_not_processed(error):
+    import requests
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    return isinstance(error, requests.exceptions.ConnectionError) and "NewConnectionError" in repr(error)
+
+# Client sharing one pooled keep-alive session between all Zabbix API calls
+class ZabbixClient:
+    def __init__(self, zabbix_url, api_token, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 breaker=None, json_codec=None, compress_requests=False, call_log=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+        self.zabbix_url = zabbix_url
+        self.json_codec, self.encode, self.decode = load_json_codec(json_codec)
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.compress_requests = compress_requests
+        self.compression_confirmed = False
+        self.request_ids = itertools.count(1)
+        self.stats = ClientStats(call_log)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_token}",
+            "Connection": "keep-alive",
+            # Set explicitly so that no proxy or session default leaves large responses uncompressed
+            "Accept-Encoding": DEFAULT_ACCEPT_ENCODING
+        })
+
+    # gzip a request body with --compress-requests, None if it is sent as is. Streamed calls
+    # are only compressed once a plain call has shown that the frontend accepts compressed
+    # bodies: telling a parse error apart would mean reading their response early.
+    def compress_body(self, body, stream):
+        if not self.compress_requests or len(body) < COMPRESS_MIN_SIZE or (stream and not self.compression_confirmed):
+            return None
+
+        import gzip
+
+        return gzip.compress(body, COMPRESS_LEVEL, mtime=0)
+
+    # Check whether the frontend refused a compressed body, which PHP without a web server
+    # input filter reports as a JSON-RPC parse error
+    def is_compression_rejected(self, response, stream):
+        if response.status_code in (400, 415):
+            return True
+        if response.status_code != 200:
+            return False
+        if stream or len(response.content) > COMPRESS_MIN_SIZE or b"-32700" not in response.content:
+            self.compression_confirmed = True
+            return False
+        try:
+            result = self.decode(response.content)
+        except ValueError:
+            return False
+        return isinstance(result, dict) and result.get("error", {}).get("code") == JSON_RPC_PARSE_ERROR
+
+    # POST an encoded JSON-RPC body through the circuit breaker, retrying transport failures and
+    # overload statuses with exponential backoff and full jitter. Non-idempotent requests are
+    # only retried when the failed attempt certainly did not reach the API. A compressed body
+    # the frontend refuses turns compression off and is resent uncompressed.
+    # Returns the response and the number of retries it took.
+    def post(self, method, body, idempotent, stream=False, headers=None):
+        import requests
+
+        # Compressed once, retries resend the same bytes
+        compressed = self.compress_body(body, stream)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                if compressed is None:
+                    response = self.session.post(self.zabbix_url, data=body, timeout=self.timeout, stream=stream,
+                                                 headers=headers)
+                else:
+                    response = self.session.post(self.zabbix_url, data=compressed, timeout=self.timeout, stream=stream,
+                                                 headers={**(headers or {}), "Content-Encoding": "gzip"})
+                rejected = compressed is not None and self.is_compression_rejected(response, stream)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                if attempt >= self.retries or not (idempotent or is_not_processed(e)):
+                    raise
+            except BaseException:
+                # Every attempt has to end in a success or failure, or the trial call after
+                # the breaker opened would keep it open for good
+                self.breaker.record_failure()
+                raise
+            else:
+                if rejected:
+                    self.breaker.record_success()
+                    response.close()
+                    self.compress_requests = False
+                    compressed = None
+                    if self.stats.call_log:
+                        self.stats.call_log("API frontend rejected a compressed request body, sending uncompressed bodies from now on")
+                    continue
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response, attempt
+                self.breaker.record_failure()
+                if attempt >= self.retries or not (idempotent or response.status_code in NOT_PROCESSED_STATUS_CODES):
+                    response.close()
+                    response.raise_for_status()
+                response.close()
+
+            import random
+
+            attempt += 1
+            self.stats.record_retry(method)
+            time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))))
+
+    # Send a single JSON-RPC request and return the decoded response
+    def call(self, method, params):
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self.request_ids)
+        }
+
+        start = time.perf_counter()
+        body = self.encode(payload)
+        try:
+            response, retries = self.post(method, body, is_idempotent(method))
+            result = self.decode(response.content)
+        except Exception:
+            self.stats.record(method, time.perf_counter() - start, error=True)
+            raise
+
+        self.stats.record(method, time.perf_counter() - start, len(body), len(response.content), error="error" in result,
+                          wire_bytes_sent=len(response.request.body), wire_bytes_received=response.raw.tell())
+
+        # A retried create may already have been applied by the failed attempt
+        if retries and method == "maintenance.create" and "error" in result and "already exists" in str(result['error'].get('data')):
+            result = self.find_created_maintenance(params, result)
+
+        return result
+
+    # Resolve an "already exists" error of a retried maintenance.create to the maintenance
+    # created by the earlier attempt, keeping the error if there is no such maintenance
+    def find_created_maintenance(self, params, error_result):
+        existing = self.call("maintenance.get", {
+            "output": ["maintenanceid"],
+            "filter": {
+                "name": params['name']
+            }
+        })
+
+        if "error" in existing or not existing['result']:
+            return error_result
+
+        return {"jsonrpc": "2.0", "result": {"maintenanceids": [existing['result'][0]['maintenanceid']]}}
+
+    # Send a single JSON-RPC request whose result is a list and yield its elements as
+    # they are parsed from the response stream. API errors are raised with error_message.
+    def call_iter(self, method, params, error_message):
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self.request_ids)
+        }
+
+        body = self.encode(payload)
+        wire_bytes_sent = 0
+        wire_bytes_received = 0
+        bytes_received = 0
+        error = False
+
+        def counted_chunks(response):
+            nonlocal bytes_received
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                bytes_received += len(chunk)
+                yield chunk
+
+        start = time.perf_counter()
+        try:
+            response, _ = self.post(method, body, is_idempotent(method), stream=True)
+            with response:
+                wire_bytes_sent = len(response.request.body)
+                try:
+                    yield from iter_json_result(counted_chunks(response))
+                except Exception as e:
+                    raise Exception(f"{error_message}: {e}")
+                finally:
+                    wire_bytes_received = response.raw.tell()
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.stats.record(method, time.perf_counter() - start, len(body) if wire_bytes_sent else 0, bytes_received,
+                              error=error, wire_bytes_sent=wire_bytes_sent, wire_bytes_received=wire_bytes_received)
+
+    # Return the Zabbix API version, apiinfo.version must be called without authentication
+    def get_api_version(self):
+        payload = {
+            "jsonrpc": "2.0",
+            "method": "apiinfo.version",
+            "params": {},
+            "id": next(self.request_ids)
+        }
+
+        response, _ = self.post("apiinfo.version", self.encode(payload), True, headers={"Authorization": None})
+        result = self.decode(response.content)
+
+        if "error" in result:
+            raise Exception(f"Error fetching API version: {result['error']['data']}")
+
+        return result['result']
+
+    # Send several (method, params) calls as one JSON-RPC batch and
+    # return the decoded responses in the order of the calls
+    def call_batch(self, calls):
+        payload = [{
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self.request_ids)
+        } for method, params in calls]
+
+        start = time.perf_counter()
+        body = self.encode(payload)
+        try:
+            idempotent = all(method.endswith(".get") for method, _ in calls)
+            response, _ = self.post("batch", body, idempotent)
+            result = self.decode(response.content)
+        except Exception:
+            self.stats.record("batch", time.perf_counter() - start, error=True)
+            raise
+
+        # A single error object means the batch as a whole was rejected
+        errors = sum(1 for item in result if "error" in item) if isinstance(result, list) else len(payload)
+        self.stats.record("batch", time.perf_counter() - start, len(body), len(response.content), error=errors > 0,
+                          wire_bytes_sent=len(response.request.body), wire_bytes_received=response.raw.tell())
+        if isinstance(result, dict):
+            raise Exception(f"Error in batch request: {result['error']['data']}")
+
+        # An item the API could not attribute comes back with a null ID, its error stands in
+        # for every call left without a response
+        responses = {item.get('id'): item for item in result}
+        missing = responses.get(None, {"error": {"code": -32603, "message": "Internal error.",
+                                                 "data": "No response to this call in the batch"}})
+        return [responses.get(request['id'], dict(missing, id=request['id'])) for request in payload]
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Stand-in for ZabbixClient used by --dry-run: read calls go to the real client, write calls
+# (create, update, delete) are only recorded and answered with placeholder results, so every
+# command runs its normal code path and the recorded calls form the plan
+class DryRunClient:
+    def __init__(self, client):
+        self.client = client
+        self.zabbix_url = client.zabbix_url
+        self.stats = client.stats
+        self.lock = threading.Lock()
+        self.reads = []
+        self.writes = []
+        self.round_trips = 0
+        self.next_id = 1
+
+    # Size of the JSON-RPC request body, encoded the way the real client sends it
+    def request_size(self, method, params):
+        return len(self.client.encode({"jsonrpc": "2.0", "method": method, "params": params, "id": 1}))
+
+    def is_write(self, method):
+        return not (method.endswith(".get") or method == "apiinfo.version")
+
+    def record_read(self, method, params):
+        with self.lock:
+            self.reads.append((method, self.request_size(method, params)))
+            self.round_trips += 1
+
+    # Record a planned write and return the result the API would give
+    def plan_write(self, method, params):
+        with self.lock:
+            self.writes.append((method, params, self.request_size(method, params)))
+            if method == "maintenance.create":
+                count = len(params) if isinstance(params, list) else 1
+                maintenance_ids = [f"new-{self.next_id + i}" for i in range(count)]
+                self.next_id += count
+                return {"maintenanceids": maintenance_ids}
+            if method == "maintenance.delete":
+                return {"maintenanceids": list(params)}
+            return {"maintenanceids": [params.get("maintenanceid")]}
+
+    def call(self, method, params):
+        if not self.is_write(method):
+            self.record_read(method, params)
+            return self.client.call(method, params)
+
+        with self.lock:
+            self.round_trips += 1
+        return {"jsonrpc": "2.0", "result": self.plan_write(method, params)}
+
+    def call_iter(self, method, params, error_message):
+        self.record_read(method, params)
+        return self.client.call_iter(method, params, error_message)
+
+    def call_batch(self, calls):
+        if not any(self.is_write(method) for method, _ in calls):
+            self.record_read("batch", [params for _, params in calls])
+            return self.client.call_batch(calls)
+
+        with self.lock:
+            self.round_trips += 1
+        return [{"jsonrpc": "2.0", "result": self.plan_write(method, params)} for method, params in calls]
+
+    def get_api_version(self):
+        self.record_read("apiinfo.version", {})
+        return self.client.get_api_version()
+
+    # Lines describing the planned writes (one per call, or per method when there are many)
+    # and the totals of the reads made and the writes planned
+    def plan_lines(self, max_calls=20):
+        lines = []
+        if not self.writes:
+            lines.append("Dry run: no write calls would be made.")
+        else:
+            lines.append("Dry run: nothing was changed. Planned write calls:")
+
+        host_total = 0
+        per_method = {}
+        for method, params, size in self.writes:
+            items = params if isinstance(params, list) else [params]
+            if method == "maintenance.delete":
+                detail = f"{len(items)} maintenance ID(s)"
+            else:
+                hosts = sum(len(item.get("hostids", [])) for item in items if isinstance(item, dict))
+                groups = sum(len(item.get("groupids", [])) for item in items if isinstance(item, dict))
+                host_total += hosts
+                if method == "maintenance.create":
+                    detail = f"{len(items)} maintenance(s), {hosts} host(s), {groups} group(s)"
+                else:
+                    fields = sorted({key for item in items for key in item if key != "maintenanceid"})
+                    detail = f"maintenance {items[0].get('maintenanceid')}: {', '.join(fields)}"
+            if len(self.writes) <= max_calls:
+                lines.append(f"  {method}: {detail}, ~{size / 1024:.1f} KiB")
+
+            calls, total_size = per_method.get(method, (0, 0))
+            per_method[method] = (calls + 1, total_size + size)
+
+        if len(self.writes) > max_calls:
+            for method, (calls, total_size) in per_method.items():
+                lines.append(f"  {method}: {calls} call(s), ~{total_size / 1024:.1f} KiB")
+
+        read_size = sum(size for _, size in self.reads)
+        write_size = sum(size for _, _, size in self.writes)
+        lines.append(f"Reads made: {len(self.reads)} request(s), ~{read_size / 1024:.1f} KiB sent")
+        lines.append(f"Writes planned: {len(self.writes)} call(s) in {self.round_trips - len(self.reads)} request(s), "
+                     f"{host_total} host ID(s), ~{write_size / 1024:.1f} KiB to send")
+        lines.append(f"Expected round trips: {self.round_trips}")
+        return lines
+
 # Function to parse the time argument (e.g., "1h" or "30m")
 def parse_time_arg(time_str):
     match = re.match(r'(\d+)([hm])', time_str)
@@ -34,110 +775,673 @@ def parse_time_arg(time_str):
     else:
         raise ValueError(f"Unsupported time unit: {unit}")
 
-# Function to get all host IDs
-def get_all_host_ids(zabbix_url, headers):
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "host.get",
-        "params": {
-            "output": ["hostid", "host"]
-        },
-        "id": 1
-    }
+# Function to build the timeperiods of --every without their period: daily, weekly on the --on
+# weekdays (e.g. "mon,fri") or monthly on the --on days of the month (e.g. "1,15"), starting at
+# --at (HH:MM, local time). The current time of day, weekday or day of month is the default.
+def build_schedule(every, at=None, on=None):
+    now = time.localtime()
+    if at:
+        match = re.fullmatch(r'(\d{1,2}):(\d{2})', at)
+        if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+            raise ValueError(f"Invalid start time: {at}. Use HH:MM, e.g. '02:30'.")
+        start_time = int(match.group(1)) * 3600 + int(match.group(2)) * 60
+    else:
+        start_time = now.tm_hour * 3600 + now.tm_min * 60
 
-    response = requests.post(zabbix_url, headers=headers, json=payload)
-    result = response.json()
+    if every == "daily":
+        if on:
+            raise ValueError("--on cannot be used with --every daily.")
+        return [{"timeperiod_type": SCHEDULE_TIMEPERIOD_TYPES[every], "every": 1, "start_time": start_time}]
 
-    if "error" in result:
-        raise Exception(f"Error fetching all hosts: {result['error']['data']}")
+    if every == "weekly":
+        days = [day.lower() for day in split_names(on)] if on else [WEEKDAYS[now.tm_wday]]
+        invalid = [day for day in days if day not in WEEKDAYS]
+        if invalid:
+            raise ValueError(f"Invalid weekday(s): {', '.join(invalid)}. Use {', '.join(WEEKDAYS)}.")
+        # One period covers all the weekdays
+        return [{"timeperiod_type": SCHEDULE_TIMEPERIOD_TYPES[every], "every": 1,
+                 "dayofweek": sum(1 << WEEKDAYS.index(day) for day in days), "start_time": start_time}]
 
-    hosts = result['result']
-    return {host['host']: host['hostid'] for host in hosts}
+    days = split_names(on) if on else [str(now.tm_mday)]
+    invalid = [day for day in days if not day.isdigit() or not 1 <= int(day) <= 31]
+    if invalid:
+        raise ValueError(f"Invalid day(s) of the month: {', '.join(invalid)}. Use 1 to 31.")
+    # A monthly period has a single day, so each day gets its own period
+    return [{"timeperiod_type": SCHEDULE_TIMEPERIOD_TYPES[every], "month": ALL_MONTHS, "day": int(day),
+             "start_time": start_time} for day in days]
 
-# Function to get the host ID based on the host name
-def get_host_id(zabbix_url, headers, host_name):
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "host.get",
-        "params": {
-            "output": ["hostid"],
+# Read-only {host name: host ID} mapping for large inventories. Names are packed into one
+# newline-joined string, host IDs are integers in a typed array and name lookups go through an
+# open-addressing hash table of positions, instead of two string objects and a dict entry per host.
+# Built from (name, host ID) pairs; a repeated name keeps its first host ID.
+class HostIndex(Mapping):
+    def __init__(self, hosts=()):
+        self.load(hosts)
+        duplicates = self.build_table()
+        if duplicates:
+            self.load([(self.name_at(position), self.host_ids[position]) for position in range(len(self.host_ids))
+                       if position not in duplicates])
+            self.build_table()
+
+    # Pack the names and IDs; offsets[i] is where name i starts, offsets[-1] is the end
+    def load(self, hosts):
+        from array import array
+
+        names = bytearray()
+        self.offsets = array("Q", [0])
+        self.host_ids = array("Q")
+        end = 0
+        for name, hostid in hosts:
+            names += name.encode() + b"\n"
+            end += len(name) + 1
+            self.offsets.append(end)
+            self.host_ids.append(int(hostid))
+        self.names = names.decode()
+
+    # Fill the hash table at a load factor of at most 1/2, returning the positions of repeated names
+    def build_table(self):
+        from array import array
+
+        size = 8
+        while size < 2 * len(self.host_ids):
+            size *= 2
+        self.mask = size - 1
+        self.table = array("q", [-1]) * size
+
+        duplicates = set()
+        for position in range(len(self.host_ids)):
+            slot = self.find_slot(self.name_at(position))
+            if self.table[slot] == -1:
+                self.table[slot] = position
+            else:
+                duplicates.add(position)
+        return duplicates
+
+    def name_at(self, position):
+        return self.names[self.offsets[position]:self.offsets[position + 1] - 1]
+
+    # Probe linearly from the name's hash to its slot, or to the empty slot where it belongs
+    def find_slot(self, name):
+        slot = hash(name) & self.mask
+        while True:
+            position = self.table[slot]
+            if position == -1 or self.name_at(position) == name:
+                return slot
+            slot = (slot + 1) & self.mask
+
+    def __getitem__(self, name):
+        position = self.table[self.find_slot(name)]
+        if position == -1:
+            raise KeyError(name)
+        return str(self.host_ids[position])
+
+    def __len__(self):
+        return len(self.host_ids)
+
+    def __iter__(self):
+        return iter(self.names[:-1].split("\n") if self.names else ())
+
+    def values(self):
+        return [str(hostid) for hostid in self.host_ids]
+
+    def items(self):
+        return zip(self, self.values())
+
+    # Select the hosts matching glob patterns (whole name, case-sensitive) and/or a compiled regex
+    # (searched in the name). Each glob runs as one regex over the packed names. Fails if a
+    # pattern matches nothing.
+    def match(self, patterns, host_regex=None):
+        from bisect import bisect_right
+
+        # Without the final newline, so a glob matching an empty string does not match the
+        # empty line after the last name; an empty index has no names to match at all
+        names = self.names[:-1]
+        matched = {}
+        for pattern in patterns:
+            matched[pattern] = [bisect_right(self.offsets, found.start()) - 1
+                                for found in re.finditer(glob_line_regex(pattern), names, re.MULTILINE)
+                                if self.host_ids]
+        if host_regex:
+            matched[host_regex.pattern] = [position for position, name in enumerate(self) if host_regex.search(name)]
+
+        unmatched = [pattern for pattern, positions in matched.items() if not positions]
+        if unmatched:
+            raise Exception(f"No hosts match: {', '.join(unmatched)}")
+
+        positions = sorted(set(itertools.chain.from_iterable(matched.values())))
+        return HostIndex((self.name_at(position), self.host_ids[position]) for position in positions)
+
+# Function to get all host IDs, streaming the response straight into a host index
+def get_all_host_ids(client):
+    hosts = client.call_iter("host.get", {
+        "output": ["hostid", "host"]
+    }, "Error fetching all hosts")
+
+    return HostIndex((host['host'], host['hostid']) for host in hosts)
+
+# Maximum number of host names sent in a single host.get filter
+HOST_CHUNK_SIZE = 500
+
+# Function to resolve many host names to host IDs with batched host.get calls.
+# With missing_ok=True unknown names are left out instead of raising.
+def get_host_ids(client, host_names, chunk_size=HOST_CHUNK_SIZE, missing_ok=False):
+    found = []
+    for i in range(0, len(host_names), chunk_size):
+        chunk = host_names[i:i + chunk_size]
+        result = client.call("host.get", {
+            "output": ["hostid", "host"],
             "filter": {
-                "host": [host_name]
+                "host": chunk
             }
-        },
-        "id": 1
+        })
+
+        if "error" in result:
+            raise Exception(f"Error fetching host IDs: {result['error']['data']}")
+
+        found.extend((host['host'], host['hostid']) for host in result['result'])
+
+    host_ids = HostIndex(found)
+
+    # Report every missing host at once instead of failing on the first one
+    missing = [host_name for host_name in host_names if host_name not in host_ids]
+    if missing and not missing_ok:
+        raise Exception(f"Host(s) not found: {', '.join(missing)}")
+
+    return host_ids
+
+# Function to get the host ID based on the host name
+def get_host_id(client, host_name):
+    return get_host_ids(client, [host_name])[host_name]
+
+# Function to check whether a --host entry is a glob pattern. None of *, ? and [ is valid
+# in a Zabbix host name, so they cannot clash with exact names.
+def is_host_pattern(name):
+    return any(char in name for char in "*?[")
+
+# Function to get the literal part of a glob pattern before its first wildcard
+def glob_prefix(pattern):
+    return re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+
+# Function to find the "]" closing the [...] class opened at pattern[start], or -1 if the "["
+# is a literal. Like fnmatch, a "]" right after "[" or "[!" is a member, not the end.
+def glob_class_end(pattern, start):
+    i = start + 1
+    if i < len(pattern) and pattern[i] == "!":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    return pattern.find("]", i)
+
+# Function to translate a glob pattern into a regex matching one whole line, so it can run
+# over many newline-joined names at once with re.MULTILINE
+def glob_line_regex(pattern):
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        end = glob_class_end(pattern, i) if char == "[" else -1
+        i += 1
+        if char == "*":
+            parts.append("[^\n]*")
+        elif char == "?":
+            parts.append("[^\n]")
+        elif end != -1:
+            body = pattern[i:end]
+            i = end + 1
+            negated = body.startswith("!")
+            # Only ranges keep their meaning, everything else re treats specially is escaped
+            body = re.sub(r"([\\\[\]^&~|])", r"\\\1", body[1:] if negated else body)
+            # [!...] must not match across names either
+            parts.append("[^" + body + "\n]" if negated else "[" + body + "]")
+        else:
+            parts.append(re.escape(char))
+    return "^" + "".join(parts) + "$"
+
+# Function to widen a glob pattern to the API's wildcard search, which only knows *
+def glob_search_pattern(pattern):
+    parts = []
+    i = 0
+    while i < len(pattern):
+        end = glob_class_end(pattern, i) if pattern[i] == "[" else -1
+        if pattern[i] == "?" or end != -1:
+            parts.append("*")
+            i = end + 1 if end != -1 else i + 1
+        else:
+            parts.append(pattern[i])
+            i += 1
+    return "".join(parts)
+
+# Function to compile the --host-regex value
+def compile_host_regex(host_regex):
+    try:
+        return re.compile(host_regex)
+    except re.error as e:
+        raise Exception(f"Invalid host regex {host_regex}: {e}")
+
+# Function to get the IDs of all hosts matching glob patterns and/or a regex. Globs are pushed
+# down as a wildcard search so only candidates are downloaded; a regex needs the full host list.
+def get_host_ids_by_patterns(client, patterns, host_regex=None):
+    compiled_regex = compile_host_regex(host_regex) if host_regex else None
+    params = {
+        "output": ["hostid", "host"]
     }
+    if not host_regex:
+        # The API search only knows *, so ? and [...] widen to * and the exact match happens here
+        params["search"] = {"host": [glob_search_pattern(pattern) for pattern in patterns]}
+        params["searchWildcardsEnabled"] = True
+        params["searchByAny"] = True
+        params["startSearch"] = True
+
+    hosts = client.call_iter("host.get", params, "Error fetching hosts by pattern")
+    return HostIndex((host['host'], host['hostid']) for host in hosts).match(patterns, compiled_regex)
+
+# Function to parse --tag values ("key=value", or "key" for any value) into host.get tag filters
+def parse_tag_filters(tags):
+    filters = []
+    for tag in tags:
+        key, separator, value = tag.partition("=")
+        if not key.strip():
+            raise Exception(f"Invalid tag filter: {tag}. Use key=value or key.")
+        if separator:
+            filters.append({"tag": key.strip(), "value": value.strip(), "operator": TAG_OPERATOR_EQUALS})
+        else:
+            filters.append({"tag": key.strip(), "operator": TAG_OPERATOR_EXISTS})
+    return filters
+
+# Function to get the IDs of the hosts matching tag filters. The API does the filtering and
+# only host IDs are downloaded. With match="all" every tag name must match (one name given
+# twice matches either value), with match="any" one matching tag is enough.
+def get_host_ids_by_tags(client, tags, match="all"):
+    hosts = client.call_iter("host.get", {
+        "output": ["hostid"],
+        "evaltype": TAG_EVAL_OR if match == "any" else TAG_EVAL_AND_OR,
+        "tags": parse_tag_filters(tags)
+    }, "Error fetching hosts by tag")
+
+    host_ids = [host['hostid'] for host in hosts]
+    if not host_ids:
+        raise Exception(f"No hosts have the tag(s): {', '.join(tags)}")
+
+    return host_ids
+
+# Function to resolve --host (names and glob patterns, or * for all hosts) and --host-regex
+# to {name: host ID}, exact names first in the order given
+def resolve_host_ids(client, inventory, host_arg, host_regex=None):
+    if host_arg == "*":
+        if inventory:
+            return inventory.get_all_host_ids()
+        return get_all_host_ids(client)
+
+    names = split_names(host_arg)
+    exact_names = [name for name in names if not is_host_pattern(name)]
+    patterns = [name for name in names if is_host_pattern(name)]
 
-    response = requests.post(zabbix_url, headers=headers, json=payload)
-    result = response.json()
+    found = {}
+    if exact_names:
+        if inventory:
+            found = inventory.get_host_ids(client, exact_names)
+        else:
+            found = get_host_ids(client, exact_names)
+
+    matched = {}
+    if patterns or host_regex:
+        if inventory:
+            matched = inventory.get_host_ids_by_patterns(patterns, host_regex)
+        else:
+            matched = get_host_ids_by_patterns(client, patterns, host_regex)
+
+    return HostIndex(itertools.chain(((name, found[name]) for name in exact_names), matched.items()))
+
+# Function to get all host IDs from multiple groups with a single hostgroup.get call
+def get_host_ids_by_groups(client, group_names):
+    result = client.call("hostgroup.get", {
+        "output": ["groupid", "name"],
+        "filter": {
+            "name": group_names
+        },
+        "selectHosts": ["hostid", "host"]
+    })
 
     if "error" in result:
-        raise Exception(f"Error fetching host ID for {host_name}: {result['error']['data']}")
+        raise Exception(f"Error fetching hosts from groups {', '.join(group_names)}: {result['error']['data']}")
 
-    if result['result']:
-        return result['result'][0]['hostid']
-    else:
-        raise Exception(f"Host {host_name} not found")
+    # Report every missing group at once instead of failing on the first one
+    found = {group['name'] for group in result['result']}
+    missing = [group_name for group_name in group_names if group_name not in found]
+    if missing:
+        raise Exception(f"Host group(s) not found: {', '.join(missing)}")
 
-# Function to get all host IDs from multiple groups
-def get_host_ids_by_groups(zabbix_url, headers, group_names):
-    host_ids = {}
-    for group_name in group_names:
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "hostgroup.get",
-            "params": {
-                "output": ["groupid"],
-                "filter": {
-                    "name": [group_name]
-                },
-                "selectHosts": ["hostid", "host"]
-            },
-            "id": 1
+    # Hosts in several groups are indexed once
+    return HostIndex((host['host'], host['hostid']) for group in result['result'] for host in group['hosts'])
+
+# Function to resolve host group names to group IDs without downloading their members
+def get_group_ids(client, group_names, missing_ok=False):
+    result = client.call("hostgroup.get", {
+        "output": ["groupid", "name"],
+        "filter": {
+            "name": group_names
         }
+    })
 
-        response = requests.post(zabbix_url, headers=headers, json=payload)
-        result = response.json()
+    if "error" in result:
+        raise Exception(f"Error fetching host groups {', '.join(group_names)}: {result['error']['data']}")
 
-        if "error" in result:
-            raise Exception(f"Error fetching hosts from group {group_name}: {result['error']['data']}")
+    group_ids = {group['name']: group['groupid'] for group in result['result']}
+    missing = [group_name for group_name in group_names if group_name not in group_ids]
+    if missing and not missing_ok:
+        raise Exception(f"Host group(s) not found: {', '.join(missing)}")
 
-        if not result['result']:
-            raise Exception(f"Host group {group_name} not found")
+    return group_ids
 
-        hosts = result['result'][0]['hosts']
-        for host in hosts:
-            host_ids[host['host']] = host['hostid']  # Add to the dictionary, avoiding duplicates
+# Function to download the full host and host group inventory.
+# Hosts are returned as an iterator over the streamed host.get response.
+def fetch_inventory(client):
+    result = client.call("hostgroup.get", {
+        "output": ["groupid", "name"]
+    })
 
-    return host_ids
+    if "error" in result:
+        raise Exception(f"Error fetching host groups: {result['error']['data']}")
 
-# Function to create maintenance and return the maintenance ID
-def create_maintenance(zabbix_url, headers, host_ids, duration):
-    start_time = int(time.time())
-    end_time = start_time + duration
-
-    # Create a unique name by appending the current timestamp
-    unique_name = f"Maintenance for selected hosts - {start_time}"
-
-    # Step 1: Create maintenance with a unique name (timestamp)
-    initial_payload = {
-        "jsonrpc": "2.0",
-        "method": "maintenance.create",
-        "params": {
-            "name": unique_name,
-            "active_since": start_time,
-            "active_till": end_time,
-            "hostids": host_ids,
-            "timeperiods": [{
-                "timeperiod_type": 0,
-                "period": duration
-            }]
-        },
-        "id": 1
+    groups = result['result']
+
+    hosts = client.call_iter("host.get", {
+        "output": ["hostid", "host"],
+        "selectHostGroups": ["groupid"]
+    }, "Error fetching all hosts")
+
+    return hosts, groups
+
+# Local SQLite copy of the host/group inventory, one database per Zabbix URL
+class InventoryCache:
+    def __init__(self, zabbix_url, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_CACHE_TTL):
+        import hashlib
+        import sqlite3
+
+        os.makedirs(cache_dir, exist_ok=True)
+        url_hash = hashlib.sha256(zabbix_url.encode()).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, f"inventory-{url_hash}.sqlite")
+        self.zabbix_url = zabbix_url
+        self.ttl = ttl
+
+        # The daemon mode shares one cache between request threads
+        self.lock = threading.RLock()
+        self.name_index = None
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS hosts (hostid TEXT PRIMARY KEY, host TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS host_groups (groupid TEXT PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS members (groupid TEXT NOT NULL, hostid TEXT NOT NULL, PRIMARY KEY (groupid, hostid));
+            CREATE INDEX IF NOT EXISTS members_hostid ON members (hostid);
+        """)
+
+    def get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # Check whether the cached inventory is younger than the TTL
+    def is_fresh(self):
+        synced_at = self.get_meta("synced_at")
+        return synced_at is not None and time.time() - float(synced_at) < self.ttl
+
+    # Replace the cached inventory with a full download from the API
+    def refresh(self, client):
+        synced_at = int(time.time())
+        hosts, groups = fetch_inventory(client)
+
+        # Hosts are written while the response is still streaming, memberships are collected on the way
+        members = []
+        def host_rows():
+            for host in hosts:
+                members.extend((group['groupid'], host['hostid']) for group in host['hostgroups'])
+                yield host['hostid'], host['host']
+
+        with self.db:
+            self.db.execute("DELETE FROM members")
+            self.db.execute("DELETE FROM hosts")
+            self.db.execute("DELETE FROM host_groups")
+            self.db.executemany("INSERT INTO host_groups (groupid, name) VALUES (?, ?)",
+                                ((group['groupid'], group['name']) for group in groups))
+            self.db.executemany("INSERT INTO hosts (hostid, host) VALUES (?, ?)", host_rows())
+            self.db.executemany("INSERT OR IGNORE INTO members (groupid, hostid) VALUES (?, ?)", members)
+            self.set_meta("zabbix_url", self.zabbix_url)
+            self.set_meta("synced_at", synced_at)
+        self.name_index = None
+
+    # Apply host and group changes recorded in the audit log since the last sync.
+    # Returns False when the gap is too large and a full refresh is needed instead.
+    def sync(self, client, max_gap=DEFAULT_MAX_SYNC_GAP):
+        last_synced = self.get_meta("synced_at")
+        synced_at = int(time.time())
+        if last_synced is None or synced_at - int(last_synced) > max_gap:
+            return False
+
+        result = client.call("auditlog.get", {
+            "output": ["resourceid", "resourcetype", "action", "clock"],
+            "filter": {
+                "resourcetype": [AUDIT_RESOURCE_HOST, AUDIT_RESOURCE_HOST_GROUP]
+            },
+            "time_from": int(last_synced) - SYNC_CLOCK_SLACK,
+            "sortfield": "clock",
+            "sortorder": "ASC",
+            "limit": AUDITLOG_LIMIT
+        })
+
+        # Audit log access needs a Super admin token, fall back to a full download otherwise
+        if "error" in result or len(result['result']) >= AUDITLOG_LIMIT:
+            return False
+
+        # Only the affected IDs matter, their current state is read back from the API
+        changed = {AUDIT_RESOURCE_HOST: set(), AUDIT_RESOURCE_HOST_GROUP: set()}
+        deleted = {AUDIT_RESOURCE_HOST: set(), AUDIT_RESOURCE_HOST_GROUP: set()}
+        for record in result['result']:
+            resource_type = int(record['resourcetype'])
+            if int(record['action']) == AUDIT_ACTION_DELETE:
+                deleted[resource_type].add(record['resourceid'])
+                changed[resource_type].discard(record['resourceid'])
+            else:
+                changed[resource_type].add(record['resourceid'])
+                deleted[resource_type].discard(record['resourceid'])
+
+        groups = []
+        if changed[AUDIT_RESOURCE_HOST_GROUP]:
+            result = client.call("hostgroup.get", {
+                "output": ["groupid", "name"],
+                "groupids": sorted(changed[AUDIT_RESOURCE_HOST_GROUP]),
+                "selectHosts": ["hostid"]
+            })
+
+            if "error" in result:
+                raise Exception(f"Error fetching changed host groups: {result['error']['data']}")
+
+            groups = result['result']
+
+        hosts = []
+        if changed[AUDIT_RESOURCE_HOST]:
+            result = client.call("host.get", {
+                "output": ["hostid", "host"],
+                "hostids": sorted(changed[AUDIT_RESOURCE_HOST]),
+                "selectHostGroups": ["groupid"]
+            })
+
+            if "error" in result:
+                raise Exception(f"Error fetching changed hosts: {result['error']['data']}")
+
+            hosts = result['result']
+
+        with self.db:
+            # Remove every touched object first so renames cannot clash on the unique names
+            for groupid in changed[AUDIT_RESOURCE_HOST_GROUP] | deleted[AUDIT_RESOURCE_HOST_GROUP]:
+                self.db.execute("DELETE FROM host_groups WHERE groupid = ?", (groupid,))
+                self.db.execute("DELETE FROM members WHERE groupid = ?", (groupid,))
+            for hostid in changed[AUDIT_RESOURCE_HOST] | deleted[AUDIT_RESOURCE_HOST]:
+                self.db.execute("DELETE FROM hosts WHERE hostid = ?", (hostid,))
+                self.db.execute("DELETE FROM members WHERE hostid = ?", (hostid,))
+
+            for group in groups:
+                self.db.execute("INSERT INTO host_groups (groupid, name) VALUES (?, ?)", (group['groupid'], group['name']))
+                self.db.executemany("INSERT OR IGNORE INTO members (groupid, hostid) VALUES (?, ?)",
+                                    ((group['groupid'], host['hostid']) for host in group['hosts']))
+            for host in hosts:
+                self.db.execute("INSERT INTO hosts (hostid, host) VALUES (?, ?)", (host['hostid'], host['host']))
+                self.db.executemany("INSERT OR IGNORE INTO members (groupid, hostid) VALUES (?, ?)",
+                                    ((group['groupid'], host['hostid']) for group in host['hostgroups']))
+            self.set_meta("synced_at", synced_at)
+        self.name_index = None
+
+        return True
+
+    # Refresh the cache when it is stale or when a refresh is forced.
+    # Returns "full" or "incremental" for the kind of refresh done, None when the cache was fresh.
+    def ensure_fresh(self, client, force=False, incremental=False, max_gap=DEFAULT_MAX_SYNC_GAP):
+        with self.lock:
+            if not force and self.is_fresh():
+                return None
+
+            if incremental and self.sync(client, max_gap=max_gap):
+                return "incremental"
+
+            self.refresh(client)
+            return "full"
+
+    def get_all_host_ids(self):
+        return self.get_name_index()
+
+    # The cache only saves API calls: names it does not know (created since the last sync)
+    # are looked up with the API before they count as not found
+    def get_host_ids(self, client, host_names, missing_ok=False):
+        with self.lock:
+            found = []
+            for i in range(0, len(host_names), HOST_CHUNK_SIZE):
+                chunk = host_names[i:i + HOST_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                found.extend(self.db.execute(f"SELECT host, hostid FROM hosts WHERE host IN ({placeholders})", chunk))
+            host_ids = HostIndex(found)
+
+        missing = [host_name for host_name in host_names if host_name not in host_ids]
+        if missing:
+            host_ids = HostIndex(itertools.chain(found, get_host_ids(client, missing, missing_ok=missing_ok).items()))
+
+        return host_ids
+
+    # In-memory HostIndex of all hosts, built on first use and dropped whenever the hosts table changes
+    def get_name_index(self):
+        with self.lock:
+            if self.name_index is None:
+                self.name_index = HostIndex(self.db.execute("SELECT host, hostid FROM hosts"))
+            return self.name_index
+
+    # Globs with a literal prefix are answered from a range scan of the host name index,
+    # anything else from the in-memory name index
+    def get_host_ids_by_patterns(self, patterns, host_regex=None):
+        compiled_regex = compile_host_regex(host_regex) if host_regex else None
+        prefixes = [glob_prefix(pattern) for pattern in patterns]
+
+        if host_regex or not all(prefixes):
+            return self.get_name_index().match(patterns, compiled_regex)
+
+        candidates = []
+        with self.lock:
+            for prefix in dict.fromkeys(prefixes):
+                upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                candidates.extend(self.db.execute("SELECT host, hostid FROM hosts WHERE host >= ? AND host < ?",
+                                                  (prefix, upper)))
+        return HostIndex(candidates).match(patterns)
+
+    # Groups the cache does not know are looked up with the API, like hosts
+    def get_group_ids(self, client, group_names, missing_ok=False):
+        with self.lock:
+            placeholders = ",".join("?" * len(group_names))
+            group_ids = dict(self.db.execute(f"SELECT name, groupid FROM host_groups WHERE name IN ({placeholders})", group_names))
+
+        missing = [group_name for group_name in group_names if group_name not in group_ids]
+        if missing:
+            group_ids.update(get_group_ids(client, missing, missing_ok=missing_ok))
+
+        return group_ids
+
+    # The members of groups the cache does not know come from the API
+    def get_host_ids_by_groups(self, client, group_names):
+        with self.lock:
+            placeholders = ",".join("?" * len(group_names))
+            cached = [name for (name,) in self.db.execute(f"SELECT name FROM host_groups WHERE name IN ({placeholders})", group_names)]
+
+            placeholders = ",".join("?" * len(cached))
+            found = list(self.db.execute(f"""
+                SELECT DISTINCT hosts.host, hosts.hostid FROM hosts
+                JOIN members ON members.hostid = hosts.hostid
+                JOIN host_groups ON host_groups.groupid = members.groupid
+                WHERE host_groups.name IN ({placeholders})
+            """, cached))
+
+        missing = [group_name for group_name in group_names if group_name not in cached]
+        if missing:
+            found.extend(get_host_ids_by_groups(client, missing).items())
+
+        return HostIndex(found)
+
+    def close(self):
+        self.db.close()
+
+# Function to build maintenance.create parameters for a one-time maintenance starting now (or at
+# start_time), or with a schedule from build_schedule(), a recurring one active until it is deleted
+def build_maintenance_params(name, host_ids, duration, group_ids=None, schedule=None, start_time=None):
+    if start_time is None:
+        start_time = int(time.time())
+
+    if schedule:
+        end_time = ZBX_MAX_DATE
+        timeperiods = [dict(timeperiod, period=duration) for timeperiod in schedule]
+    else:
+        end_time = start_time + duration
+        timeperiods = [{
+            "timeperiod_type": 0,
+            "period": duration
+        }]
+
+    params = {
+        "name": name,
+        "active_since": start_time,
+        "active_till": end_time,
+        "timeperiods": timeperiods
     }
+    if host_ids:
+        params["hostids"] = host_ids
+    if group_ids:
+        # Zabbix resolves group members itself, so membership changes during the window are honoured
+        params["groupids"] = group_ids
+
+    return params
+
+# Function to generate a maintenance name that cannot collide with another run
+def generate_maintenance_name():
+    import uuid
 
-    response = requests.post(zabbix_url, headers=headers, json=initial_payload)
-    result = response.json()
+    return f"{MAINTENANCE_NAME_PREFIX}{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+# Function to create maintenance for hosts and/or host groups and return the maintenance ID.
+# With rename=False the collision-free generated name is kept and creation is a single call.
+def create_maintenance(client, host_ids, duration, group_ids=None, rename=True, schedule=None):
+    if not rename:
+        params = build_maintenance_params(generate_maintenance_name(), host_ids, duration, group_ids, schedule)
+        result = client.call("maintenance.create", params)
+
+        if "error" in result:
+            raise Exception(f"Error creating maintenance: {result['error']['data']}")
+
+        return result['result']['maintenanceids'][0]
+
+    # Create a unique temporary name; a bare timestamp collides when several
+    # maintenances are created in the same second
+    unique_name = generate_maintenance_name()
+    params = build_maintenance_params(unique_name, host_ids, duration, group_ids, schedule)
+
+    # Step 1: Create maintenance with a unique temporary name
+    result = client.call("maintenance.create", params)
 
     if "error" in result:
         raise Exception(f"Error creating maintenance: {result['error']['data']}")
@@ -146,19 +1450,11 @@ def create_maintenance(zabbix_url, headers, host_ids, duration):
     maintenance_id = result['result']['maintenanceids'][0]
 
     # Step 3: Update the maintenance name to include the maintenance ID
-    updated_name = f"Maintenance for selected hosts - Maintenance ID:{maintenance_id}"
-    update_payload = {
-        "jsonrpc": "2.0",
-        "method": "maintenance.update",
-        "params": {
-            "maintenanceid": maintenance_id,
-            "name": updated_name
-        },
-        "id": 1
-    }
-
-    update_response = requests.post(zabbix_url, headers=headers, json=update_payload)
-    update_result = update_response.json()
+    updated_name = f"{MAINTENANCE_NAME_PREFIX}Maintenance ID:{maintenance_id}"
+    update_result = client.call("maintenance.update", {
+        "maintenanceid": maintenance_id,
+        "name": updated_name
+    })
 
     if "error" in update_result:
         raise Exception(f"Error updating maintenance name: {update_result['error']['data']}")
@@ -166,47 +1462,495 @@ def create_maintenance(zabbix_url, headers, host_ids, duration):
     # Returning the updated maintenance ID
     return maintenance_id
 
-# Function to list all maintenance tasks
-def list_maintenance_tasks(zabbix_url, headers):
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "maintenance.get",
-        "params": {
-            "output": ["maintenanceid", "name", "active_since", "active_till"],
-            "sortfield": "active_since",
-            "sortorder": "DESC"
+# Function to create a maintenance for a large host list as several shards of at most
+# shard_size hosts, created in parallel. Returns the shared set ID and the shard maintenance IDs.
+def create_sharded_maintenance(client, host_ids, duration, shard_size, concurrency=DEFAULT_CONCURRENCY,
+                               schedule=None):
+    import concurrent.futures
+    import uuid
+
+    # All shards share one window, however long creating them takes
+    start_time = int(time.time())
+    set_id = f"{start_time}-{uuid.uuid4().hex[:8]}"
+    shards = [host_ids[i:i + shard_size] for i in range(0, len(host_ids), shard_size)]
+
+    def create_shard(shard_number):
+        name = f"{MAINTENANCE_NAME_PREFIX}{set_id} shard {shard_number}/{len(shards)}"
+        result = client.call("maintenance.create", build_maintenance_params(name, shards[shard_number - 1], duration,
+                                                                            schedule=schedule, start_time=start_time))
+
+        if "error" in result:
+            raise Exception(f"Error creating maintenance shard {shard_number}/{len(shards)}: {result['error']['data']}")
+
+        return result['result']['maintenanceids'][0]
+
+    maintenance_ids = []
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(create_shard, n) for n in range(1, len(shards) + 1)]:
+            try:
+                maintenance_ids.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    # Do not leave a partial set behind
+    if errors:
+        if maintenance_ids:
+            delete_maintenance_tasks(client, maintenance_ids)
+        raise errors[0]
+
+    return set_id, maintenance_ids
+
+# Function to create many maintenances in one JSON-RPC batch. Names cannot be changed to the IDs
+# within the batch, so they keep their generated names like create_maintenance(rename=False).
+# Takes (host_ids, duration, group_ids) tuples and returns one (maintenance_id, error) tuple per entry.
+def create_maintenances(client, maintenances, schedule=None):
+    calls = [("maintenance.create", build_maintenance_params(generate_maintenance_name(), host_ids, duration, group_ids,
+                                                             schedule))
+             for host_ids, duration, group_ids in maintenances]
+
+    results = []
+    for result in client.call_batch(calls):
+        if "error" in result:
+            results.append((None, f"Error creating maintenance: {result['error']['data']}"))
+        else:
+            results.append((result['result']['maintenanceids'][0], None))
+
+    return results
+
+# Function to split a comma-separated string (or a list, from JSON) into names, dropping
+# duplicates and blanks while keeping their order
+def split_names(value):
+    names = value if isinstance(value, list) else (value or "").split(",")
+    return list(dict.fromkeys(str(name).strip() for name in names if str(name).strip()))
+
+# Function to read a jobs file, either JSON lines like {"host": "a,b", "group": "G", "time": "1h"}
+# or CSV with a host,group,time header. Every invalid line is reported at once.
+def load_jobs(jobs_file, content=None):
+    import csv
+
+    if content is None:
+        with open(jobs_file, newline="") as f:
+            content = f.read()
+    lines = content.splitlines()
+
+    rows = []
+    errors = []
+    if "".join(lines).lstrip().startswith("{"):
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("not a JSON object")
+                rows.append((line_number, row))
+            except ValueError as e:
+                errors.append(f"line {line_number}: {e}")
+    else:
+        # Blank lines are emptied rather than dropped, so line_num still counts every line
+        reader = csv.DictReader(line if line.strip() else "" for line in lines)
+        for row in reader:
+            rows.append((reader.line_num, row))
+
+    jobs = []
+    for line_number, row in rows:
+        job = {
+            "line": line_number,
+            "hosts": split_names(row.get("host")),
+            "groups": split_names(row.get("group")),
+            "error": None
+        }
+        try:
+            if not row.get("time"):
+                raise Exception("no time given")
+            job['duration'] = parse_time_arg(str(row['time']).strip())
+            if not job['hosts'] and not job['groups']:
+                raise Exception("no host or group given")
+            if "*" in job['hosts'] and (len(job['hosts']) > 1 or job['groups']):
+                raise Exception("* cannot be combined with other hosts or groups")
+        except Exception as e:
+            errors.append(f"line {line_number}: {e}")
+        jobs.append(job)
+
+    if errors:
+        raise Exception(f"Invalid jobs file {jobs_file}: {'; '.join(errors)}")
+    if not jobs:
+        raise Exception(f"No jobs in {jobs_file}")
+
+    return jobs
+
+# Function to resolve the hosts and groups of all jobs together, so every distinct name is
+# looked up once whatever the number of jobs. Unknown names fail only the jobs using them.
+def resolve_jobs(client, inventory, jobs):
+    host_names = list(dict.fromkeys(name for job in jobs for name in job['hosts'] if name != "*"))
+    group_names = list(dict.fromkeys(name for job in jobs for name in job['groups']))
+
+    hosts = {}
+    if host_names:
+        if inventory:
+            hosts = inventory.get_host_ids(client, host_names, missing_ok=True)
+        else:
+            hosts = get_host_ids(client, host_names, missing_ok=True)
+
+    groups = {}
+    if group_names:
+        if inventory:
+            groups = inventory.get_group_ids(client, group_names, missing_ok=True)
+        else:
+            groups = get_group_ids(client, group_names, missing_ok=True)
+
+    all_hosts = {}
+    if any(job['hosts'] == ["*"] for job in jobs):
+        if inventory:
+            all_hosts = inventory.get_all_host_ids()
+        else:
+            all_hosts = get_all_host_ids(client)
+
+    for job in jobs:
+        missing_hosts = [name for name in job['hosts'] if name != "*" and name not in hosts]
+        missing_groups = [name for name in job['groups'] if name not in groups]
+        if missing_hosts:
+            job['error'] = f"Host(s) not found: {', '.join(missing_hosts)}"
+        elif missing_groups:
+            job['error'] = f"Host group(s) not found: {', '.join(missing_groups)}"
+        elif job['hosts'] == ["*"]:
+            job['host_ids'] = list(all_hosts.values())
+            job['group_ids'] = None
+        else:
+            job['host_ids'] = [hosts[name] for name in job['hosts']]
+            job['group_ids'] = [groups[name] for name in job['groups']] or None
+
+    return jobs
+
+# Function to create the maintenances of resolved jobs, at most concurrency at a time.
+# With merge=True a job matching an active maintenance extends it instead.
+# Yields (job, maintenance_ids, error) in job order as soon as each result is known.
+# With rename=False and no merge, the jobs that need no sharding are created in one JSON-RPC batch.
+def create_job_maintenances(client, jobs, concurrency=DEFAULT_CONCURRENCY, rename=True, shard_size=None,
+                            merge=False):
+    import concurrent.futures
+
+    def create_job(job):
+        if merge:
+            merged = merge_maintenance(client, job['host_ids'], job['duration'], job['group_ids'])
+            if merged:
+                job['merged'] = True
+                return [merged[0]]
+        if shard_size and len(job['host_ids']) > shard_size and not job['group_ids']:
+            return create_sharded_maintenance(client, job['host_ids'], job['duration'], shard_size, concurrency=1)[1]
+        return [create_maintenance(client, job['host_ids'], job['duration'], group_ids=job['group_ids'], rename=rename)]
+
+    def is_sharded(job):
+        return shard_size and len(job['host_ids']) > shard_size and not job['group_ids']
+
+    batched = {}
+    if not rename and not merge:
+        plain = [index for index, job in enumerate(jobs) if not job['error'] and not is_sharded(job)]
+        if plain:
+            try:
+                results = create_maintenances(client, [(jobs[index]['host_ids'], jobs[index]['duration'],
+                                                        jobs[index]['group_ids']) for index in plain])
+            except Exception as e:
+                # A rejected batch fails each of its jobs
+                results = [(None, str(e))] * len(plain)
+            batched = dict(zip(plain, results))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [None if job['error'] or index in batched else executor.submit(create_job, job)
+                   for index, job in enumerate(jobs)]
+        for index, (job, future) in enumerate(zip(jobs, futures)):
+            if index in batched:
+                maintenance_id, error = batched[index]
+                yield job, [maintenance_id] if maintenance_id else [], error
+                continue
+            if future is None:
+                yield job, [], job['error']
+                continue
+            try:
+                yield job, future.result(), None
+            except Exception as e:
+                yield job, [], str(e)
+
+# Function to move the end of a fetched maintenance (with its timeperiods) to end_time
+def update_maintenance_end(client, maintenance, end_time):
+    maintenance_id = maintenance['maintenanceid']
+    params = {
+        "maintenanceid": maintenance_id,
+        "active_till": end_time
+    }
+    # A one-time period has to be stretched as well, recurring periods stay as they are
+    timeperiods = maintenance.get('timeperiods', [])
+    if timeperiods and all(int(period['timeperiod_type']) == 0 for period in timeperiods):
+        start_date = min(int(period.get('start_date', maintenance['active_since'])) for period in timeperiods)
+        params["timeperiods"] = [{
+            "timeperiod_type": 0,
+            "start_date": start_date,
+            "period": end_time - start_date
+        }]
+
+    result = client.call("maintenance.update", params)
+
+    if "error" in result:
+        raise Exception(f"Error extending maintenance {maintenance_id}: {result['error']['data']}")
+
+# Function to extend a maintenance by duration seconds past its current end (or past now,
+# if it already ended), at most to ZBX_MAX_DATE, and return the new end time
+def extend_maintenance(client, maintenance_id, duration):
+    result = client.call("maintenance.get", {
+        "output": ["maintenanceid", "active_since", "active_till"],
+        "selectTimeperiods": "extend",
+        "maintenanceids": [maintenance_id]
+    })
+
+    if "error" in result:
+        raise Exception(f"Error fetching maintenance {maintenance_id}: {result['error']['data']}")
+
+    if not result['result']:
+        raise Exception(f"Maintenance {maintenance_id} not found")
+
+    maintenance = result['result'][0]
+    # A recurring maintenance of --every already runs until ZBX_MAX_DATE, the API rejects anything later
+    end_time = min(max(int(maintenance['active_till']), int(time.time())) + duration, ZBX_MAX_DATE)
+    update_maintenance_end(client, maintenance, end_time)
+
+    return end_time
+
+# Function to find an active one-time maintenance created by this script that covers exactly
+# the given hosts and groups. Returns the one ending last, or None.
+def find_matching_maintenance(client, host_ids, group_ids=None):
+    params = {
+        "output": ["maintenanceid", "name", "active_since", "active_till"],
+        "selectHosts": ["hostid"],
+        "selectHostGroups": ["groupid"],
+        "selectTimeperiods": "extend",
+        "search": {
+            "name": MAINTENANCE_NAME_PREFIX
         },
-        "id": 1
+        "startSearch": True
     }
+    if not host_ids and not group_ids:
+        raise Exception("No hosts or host groups selected, there is nothing to merge.")
 
-    response = requests.post(zabbix_url, headers=headers, json=payload)
-    result = response.json()
+    # A match covers every host, so filtering on any one of them finds it without sending the whole list
+    if host_ids:
+        params["hostids"] = [host_ids[0]]
+    else:
+        params["groupids"] = [group_ids[0]]
+
+    result = client.call("maintenance.get", params)
 
     if "error" in result:
-        raise Exception(f"Error listing maintenance tasks: {result['error']['data']}")
+        raise Exception(f"Error looking up matching maintenance: {result['error']['data']}")
 
-    return result['result']
+    wanted_hosts = set(host_ids)
+    wanted_groups = set(group_ids or [])
+    matches = [
+        maintenance for maintenance in filter_maintenance_tasks(result['result'], state="active")
+        if {host['hostid'] for host in maintenance['hosts']} == wanted_hosts
+        and {group['groupid'] for group in maintenance['hostgroups']} == wanted_groups
+        and all(int(period['timeperiod_type']) == 0 for period in maintenance['timeperiods'])
+    ]
+    if not matches:
+        return None
 
-# Function to delete multiple maintenance tasks by their IDs
-def delete_maintenance_tasks(zabbix_url, headers, maintenance_ids):
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "maintenance.delete",
-        "params": maintenance_ids,  # Send a list of maintenance IDs to delete
-        "id": 1
+    return max(matches, key=lambda maintenance: int(maintenance['active_till']))
+
+# Function to merge a maintenance request into a matching active maintenance instead of
+# creating a duplicate: its end moves to now + duration unless it already ends later.
+# Returns (maintenance_id, end_time, extended), or None if there is nothing to merge into.
+def merge_maintenance(client, host_ids, duration, group_ids=None):
+    maintenance = find_matching_maintenance(client, host_ids, group_ids)
+    if maintenance is None:
+        return None
+
+    end_time = int(time.time()) + duration
+    if int(maintenance['active_till']) >= end_time:
+        return maintenance['maintenanceid'], int(maintenance['active_till']), False
+
+    update_maintenance_end(client, maintenance, end_time)
+    return maintenance['maintenanceid'], end_time, True
+
+# Function to list maintenance tasks, newest first. Name prefix, host, group and limit
+# filters are applied by the API and the tasks are yielded while the response streams in.
+def list_maintenance_tasks(client, name_prefix=None, host_ids=None, group_ids=None, limit=None):
+    params = {
+        "output": ["maintenanceid", "name", "active_since", "active_till"],
+        "sortfield": "active_since",
+        "sortorder": "DESC"
     }
+    if name_prefix:
+        params["search"] = {"name": name_prefix}
+        params["startSearch"] = True
+    if host_ids:
+        params["hostids"] = host_ids
+    if group_ids:
+        params["groupids"] = group_ids
+    if limit:
+        params["limit"] = limit
+
+    return client.call_iter("maintenance.get", params, "Error listing maintenance tasks")
+
+# Function to keep only active or only expired maintenance tasks, stopping after limit tasks.
+# maintenance.get cannot filter on time, so this happens while the response streams in.
+def filter_maintenance_tasks(tasks, state=None, limit=None):
+    now = time.time()
+    count = 0
+    for task in tasks:
+        if state == "active" and not int(task['active_since']) <= now < int(task['active_till']):
+            continue
+        if state == "expired" and int(task['active_till']) > now:
+            continue
+        yield task
+        count += 1
+        if limit and count >= limit:
+            return
+
+# Function to merge the shards of each sharded maintenance in a task stream into one entry,
+# placed where its first shard arrived. Shards of concurrent sets interleave in any order, so
+# an entry is yielded once it and everything before it is complete: a set when all of its
+# shards have arrived, the rest when the stream ends (e.g. cut off by a limit).
+def group_shard_sets(tasks):
+    from collections import deque
+
+    pending = deque()
+    sets = {}
+    missing = {}
+    for task in tasks:
+        match = SHARD_NAME_PATTERN.match(task['name'])
+        if not match:
+            pending.append(task)
+        else:
+            set_id = match.group('set_id')
+            if set_id not in sets:
+                sets[set_id] = {
+                    "set_id": set_id,
+                    "maintenanceids": [],
+                    "active_since": task['active_since'],
+                    "active_till": task['active_till']
+                }
+                missing[set_id] = int(match.group('total'))
+                pending.append(sets[set_id])
+            sets[set_id]['maintenanceids'].append(task['maintenanceid'])
+            missing[set_id] -= 1
+
+        while pending and ('set_id' not in pending[0] or missing[pending[0]['set_id']] <= 0):
+            yield pending.popleft()
+
+    yield from pending
+
+# Function to look up the maintenance IDs of all shards of a sharded maintenance
+def get_shard_set_ids(client, set_id):
+    result = client.call("maintenance.get", {
+        "output": ["maintenanceid", "name"],
+        "search": {
+            "name": f"{MAINTENANCE_NAME_PREFIX}{set_id} shard "
+        },
+        "startSearch": True
+    })
 
-    response = requests.post(zabbix_url, headers=headers, json=payload)
-    result = response.json()
+    if "error" in result:
+        raise Exception(f"Error looking up maintenance set {set_id}: {result['error']['data']}")
+
+    maintenance_ids = [task['maintenanceid'] for task in result['result'] if SHARD_NAME_PATTERN.match(task['name'])]
+    if not maintenance_ids:
+        raise Exception(f"Maintenance set {set_id} not found")
+
+    return maintenance_ids
+
+# Function to delete multiple maintenance tasks by their IDs
+def delete_maintenance_tasks(client, maintenance_ids):
+    # Send a list of maintenance IDs to delete
+    result = client.call("maintenance.delete", maintenance_ids)
 
     if "error" in result:
         raise Exception(f"Error deleting maintenance tasks {maintenance_ids}: {result['error']['data']}")
 
     return result['result']['maintenanceids']
 
-# Main function
-def main():
-    parser = argparse.ArgumentParser(
+# Function to delete many maintenance tasks in chunks of at most chunk_size IDs, running
+# up to concurrency chunks in parallel. Returns the deleted IDs; if a chunk fails, the
+# other chunks still run and the error reports how many tasks were deleted.
+def delete_maintenance_tasks_chunked(client, maintenance_ids, chunk_size=DEFAULT_DELETE_CHUNK_SIZE,
+                                     concurrency=1):
+    import concurrent.futures
+
+    chunks = [maintenance_ids[i:i + chunk_size] for i in range(0, len(maintenance_ids), chunk_size)]
+
+    deleted_ids = []
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(delete_maintenance_tasks, client, chunk) for chunk in chunks]:
+            try:
+                deleted_ids.extend(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        raise Exception(f"Deleted {len(deleted_ids)} maintenance task(s), {len(errors)} of {len(chunks)} chunk(s) failed: {errors[0]}")
+
+    return deleted_ids
+
+# Function to find the expired maintenance tasks created by this script
+def get_expired_maintenance_tasks(client):
+    tasks = list_maintenance_tasks(client, name_prefix=MAINTENANCE_NAME_PREFIX)
+    return list(filter_maintenance_tasks(tasks, state="expired"))
+
+# Function to print one line of --log-calls
+def log_call(line):
+    print(line, file=sys.stderr, flush=True)
+
+# Function to print and/or push the API call statistics requested on the command line
+def report_stats(args, stats):
+    if args.stats:
+        print(json.dumps(stats.as_dict(), indent=2), file=sys.stderr)
+
+    if args.stats_trapper:
+        try:
+            server, port, stats_host = load_trapper_config(args.config)
+            stats.send_to_trapper(server, port, stats_host)
+        except Exception as e:
+            print(f"Error: pushing statistics failed: {e}", file=sys.stderr)
+
+# Options a client may set for a command run by the daemon, everything else is daemon configuration
+DAEMON_OPTIONS = ("host", "host_regex", "tag", "tag_match", "group", "snapshot_members", "time", "single_call", "shard_size", "concurrency",
+                  "list", "active", "expired", "name_prefix", "mine", "limit", "delete", "purge_expired",
+                  "chunk_size", "dry_run", "extend", "refresh", "jobs", "merge", "every", "at", "on")
+
+# Function to parse a count option that must be at least 1
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid positive integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return number
+
+# Parser of daemon requests: invalid options raise ValueError instead of exiting the daemon
+class RequestParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ValueError(message)
+
+# Function to turn the options of a daemon request back into command line arguments, so they
+# go through the same types and choices as on the command line
+def daemon_argv(options):
+    argv = []
+    for option, value in options.items():
+        flag = "--" + option.replace("_", "-")
+        if value is True:
+            argv.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, list):
+            argv.extend(f"{flag}={item}" for item in value)
+        else:
+            argv.append(f"{flag}={value}")
+    return argv
+
+# Function to build the command line parser
+def build_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(
         description="Create, list, or delete Zabbix maintenance tasks for one or more hosts or groups.",
         epilog="""
 Examples of usage:
@@ -221,66 +1965,545 @@ Examples of usage:
     python zabbix_maintenance_new.py --config zbx_api.conf --delete 53,54
         """
     )
-    parser.add_argument("--config", required=True, help="Path to the configuration file")
-    parser.add_argument("--host", help="Comma-separated hostnames or * for all hosts")
+    parser.add_argument("--config", help="Path to the configuration file (not needed with --daemon)")
+    parser.add_argument("--host", help="Comma-separated hostnames and glob patterns (e.g. 'web-*-fra*'), or * for all hosts")
+    parser.add_argument("--host-regex", help="Select hosts whose name matches this regular expression (in addition to --host)")
+    parser.add_argument("--tag", action="append", help="Select hosts by tag, as key=value or key for any value; repeat for several tags")
+    parser.add_argument("--tag-match", choices=("all", "any"), default="all", help="With several --tag, require all tag names to match or any tag")
     parser.add_argument("--group", help="Comma-separated host group names to apply maintenance to all hosts in those groups")
+    parser.add_argument("--snapshot-members", action="store_true", help="With --group, put the current group members into maintenance instead of the groups themselves")
     parser.add_argument("--time", help="Maintenance duration (e.g., '1h', '30m')")
-    parser.add_argument("--list", action="store_true", help="List all active maintenance tasks")
-    parser.add_argument("--delete", help="Comma-separated maintenance IDs to delete")
+    parser.add_argument("--every", choices=tuple(SCHEDULE_TIMEPERIOD_TYPES), help="Create one recurring maintenance with a --time long window every day, week or month, active until deleted")
+    parser.add_argument("--at", help="With --every, start time of the window as HH:MM local time (default: now)")
+    parser.add_argument("--on", help="With --every weekly, comma-separated weekdays (mon..sun); with --every monthly, days of the month (default: today)")
+    parser.add_argument("--single-call", action="store_true", help="Create the maintenance in one API call with a generated unique name instead of renaming it to its ID (with --jobs, all creates go out in one JSON-RPC batch)")
+    parser.add_argument("--shard-size", type=positive_int, help="Split the host list into maintenances of at most this many hosts, managed as one set")
+    parser.add_argument("--concurrency", type=positive_int, default=DEFAULT_CONCURRENCY, help="Number of shards or jobs created or delete chunks sent in parallel")
+    parser.add_argument("--jobs", metavar="FILE", help="Create one maintenance per line of a JSON lines or CSV (host,group,time) file")
+    parser.add_argument("--list", action="store_true", help="List maintenance tasks, optionally only those of the --host/--group given")
+    parser.add_argument("--active", action="store_true", help="With --list, show only maintenance tasks active now")
+    parser.add_argument("--expired", action="store_true", help="With --list, show only expired maintenance tasks")
+    parser.add_argument("--name-prefix", help="With --list, show only maintenance tasks whose name starts with this")
+    parser.add_argument("--mine", action="store_true", help="With --list, show only maintenance tasks created by this script")
+    parser.add_argument("--limit", type=positive_int, help="With --list, show at most this many maintenance objects (shards count individually)")
+    parser.add_argument("--delete", help="Comma-separated maintenance IDs or maintenance set IDs to delete")
+    parser.add_argument("--extend", help="Maintenance ID to extend by --time past its current end")
+    parser.add_argument("--merge", action="store_true", help="Instead of creating a duplicate, extend an active maintenance of this script covering exactly the same hosts/groups")
+    parser.add_argument("--purge-expired", action="store_true", help="Delete all expired maintenance tasks created by this script")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_DELETE_CHUNK_SIZE, help="Maximum number of maintenance tasks deleted per API call")
+    parser.add_argument("--dry-run", action="store_true", help="Only make read calls and print the write calls that would be made, with host counts, request sizes and round trips")
+    parser.add_argument("--stats", action="store_true", help="Print per-method API call statistics as JSON to stderr")
+    parser.add_argument("--stats-trapper", action="store_true", help="Push API call statistics to Zabbix trapper items (ZABBIX_SERVER and STATS_HOST in the config file)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Number of keep-alive connections kept in the HTTP pool")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT, help="Connect timeout for API calls in seconds")
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT, help="Read timeout for API calls in seconds")
+    parser.add_argument("--json-codec", choices=JSON_CODECS, help="JSON library for API requests and responses (default: the fastest installed)")
+    parser.add_argument("--compress-requests", action="store_true", help="gzip large API request bodies, falling back to plain bodies if the frontend does not accept them")
+    parser.add_argument("--log-calls", action="store_true", help="Print the time and JSON and on-the-wire sizes of every API call to stderr")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries of failed API calls (0 disables retrying)")
+    parser.add_argument("--breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD, help="Consecutive API failures after which calls stop for --breaker-timeout seconds")
+    parser.add_argument("--breaker-timeout", type=float, default=DEFAULT_BREAKER_TIMEOUT, help="Seconds to wait before calling a failing API again")
+    parser.add_argument("--cache", action="store_true", help="Serve host and group lookups from the local inventory cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory holding the inventory cache")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_CACHE_TTL, help="Maximum age of the inventory cache in seconds")
+    parser.add_argument("--refresh", action="store_true", help="Refresh the inventory cache before use (implies --cache)")
+    parser.add_argument("--incremental", action="store_true", help="Refresh the inventory cache from the audit log instead of a full download")
+    parser.add_argument("--max-sync-gap", type=int, default=DEFAULT_MAX_SYNC_GAP, help="Seconds since the last sync after which --incremental does a full download")
 
-    args = parser.parse_args()
+    parser.add_argument("--serve", metavar="ADDRESS", help="Run as a daemon serving commands on a Unix socket path or a loopback host:port")
+    parser.add_argument("--daemon", metavar="ADDRESS", help="Send the command to a daemon started with --serve instead of calling Zabbix")
+    return parser
 
-    try:
-        zabbix_url, api_token = load_zabbix_config(args.config)
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_token}"
-        }
+# Function to run one command (list, delete, purge, extend, create or refresh) with an
+# existing client and inventory cache, passing each line of output to output()
+def run_command(args, client, inventory, output=print):
+    # A dry run executes the command against a client that only reads, then prints the plan
+    if args.dry_run and not isinstance(client, DryRunClient):
+        planner = DryRunClient(client)
+        try:
+            run_command(args, planner, inventory, output=lambda line: output(f"[dry run] {line}"))
+        finally:
+            # Also when the command fails, e.g. a failed job, the plan shows what the rest would do
+            for line in planner.plan_lines():
+                output(line)
+        return
+
+    refreshed = None
+    if inventory:
+        refreshed = inventory.ensure_fresh(client, force=args.refresh, incremental=args.incremental,
+                                           max_gap=args.max_sync_gap)
 
-        if args.list:
-            # List all maintenance tasks
-            tasks = list_maintenance_tasks(zabbix_url, headers)
-            for task in tasks:
-                start_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(task['active_since'])))
-                end_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(task['active_till'])))
-                print(f"Maintenance ID: {task['maintenanceid']}, Name: {task['name']}, Start: {start_time}, End: {end_time}")
+    if args.list:
+        # List maintenance tasks, printing each one as soon as it arrives
+        if args.active and args.expired:
+            raise Exception("--active and --expired cannot be combined.")
+        state = "active" if args.active else "expired" if args.expired else None
+
+        name_prefix = args.name_prefix
+        if args.mine and not (name_prefix or "").startswith(MAINTENANCE_NAME_PREFIX):
+            name_prefix = MAINTENANCE_NAME_PREFIX + (name_prefix or "")
+
+        host_ids = None
+        if args.host or args.host_regex:
+            host_ids = list(resolve_host_ids(client, inventory, args.host, args.host_regex).values())
+        elif args.tag:
+            host_ids = get_host_ids_by_tags(client, args.tag, match=args.tag_match)
+
+        group_ids = None
+        if args.group:
+            group_names = [group.strip() for group in args.group.split(',')]
+            if inventory:
+                groups = inventory.get_group_ids(client, group_names)
+            else:
+                groups = get_group_ids(client, group_names)
+            group_ids = list(groups.values())
+
+        # The time filter is client-side, so the limit must be applied after it
+        tasks = list_maintenance_tasks(client, name_prefix=name_prefix, host_ids=host_ids, group_ids=group_ids,
+                                       limit=None if state else args.limit)
+        for task in group_shard_sets(filter_maintenance_tasks(tasks, state=state, limit=args.limit)):
+            start_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(task['active_since'])))
+            end_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(task['active_till'])))
+            if 'set_id' in task:
+                output(f"Maintenance set: {task['set_id']}, Shards: {len(task['maintenanceids'])}, IDs: {','.join(task['maintenanceids'])}, Start: {start_time}, End: {end_time}")
+            else:
+                output(f"Maintenance ID: {task['maintenanceid']}, Name: {task['name']}, Start: {start_time}, End: {end_time}")
+    
+    elif args.delete:
+        # Delete the specified maintenance tasks (comma-separated list)
+        maintenance_ids = []
+        for maintenance_id in args.delete.split(','):
+            maintenance_id = maintenance_id.strip()
+            if maintenance_id.isdigit():
+                maintenance_ids.append(maintenance_id)
+            else:
+                # Anything that is not a plain ID names a sharded maintenance set
+                maintenance_ids.extend(get_shard_set_ids(client, maintenance_id))
+        deleted_ids = delete_maintenance_tasks_chunked(client, maintenance_ids, chunk_size=args.chunk_size,
+                                                       concurrency=args.concurrency)
+        output(f"Deleted maintenance task(s) with ID(s): {', '.join(deleted_ids)}")
+
+    elif args.purge_expired:
+        # Delete expired maintenance tasks created by this script
+        tasks = get_expired_maintenance_tasks(client)
+        if not tasks:
+            output("No expired maintenance tasks to delete.")
+        else:
+            if args.dry_run:
+                ended = sorted(int(task['active_till']) for task in tasks)
+                oldest = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ended[0]))
+                newest = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ended[-1]))
+                output(f"Expired maintenance tasks ended between {oldest} and {newest}.")
+            maintenance_ids = [task['maintenanceid'] for task in tasks]
+            deleted_ids = delete_maintenance_tasks_chunked(client, maintenance_ids, chunk_size=args.chunk_size,
+                                                           concurrency=args.concurrency)
+            output(f"Deleted {len(deleted_ids)} expired maintenance task(s).")
+
+    elif args.extend:
+        # Extend an existing maintenance
+        if not args.time:
+            raise Exception("--extend needs --time for the extension.")
+        end_time = extend_maintenance(client, args.extend.strip(), parse_time_arg(args.time))
+        output(f"Extended maintenance {args.extend.strip()} until {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}")
+
+    elif args.jobs:
+        # Create one maintenance per job, resolving the names of all jobs up front
+        if args.every:
+            raise Exception("--every cannot be used with --jobs.")
+        jobs = resolve_jobs(client, inventory, load_jobs(args.jobs, getattr(args, "jobs_content", None)))
+        failed = 0
+        for job, maintenance_ids, error in create_job_maintenances(client, jobs, concurrency=args.concurrency,
+                                                                   rename=not args.single_call,
+                                                                   shard_size=args.shard_size,
+                                                                   merge=args.merge):
+            if error:
+                failed += 1
+                output(f"Job on line {job['line']}: {error}")
+            else:
+                action = "merged into" if job.get('merged') else "created"
+                output(f"Job on line {job['line']}: {action} maintenance with ID(s): {', '.join(maintenance_ids)}")
+
+        output(f"Completed {len(jobs) - failed} of {len(jobs)} job(s).")
+        if failed:
+            raise Exception(f"{failed} of {len(jobs)} job(s) failed.")
+
+    elif args.time:
+        # Create maintenance based on hosts or groups
+        duration_seconds = parse_time_arg(args.time)
+
+        schedule = None
+        if args.every:
+            if args.merge:
+                raise Exception("--merge cannot be used with --every.")
+            schedule = build_schedule(args.every, args.at, args.on)
+        elif args.at or args.on:
+            raise Exception("--at and --on need --every.")
+
+        group_ids = None
+
+        if args.tag and (args.host or args.host_regex or args.group):
+            raise Exception("--tag cannot be combined with --host, --host-regex or --group.")
+
+        if args.group and not args.snapshot_members:
+            group_names = [group.strip() for group in args.group.split(',')]
+            if inventory:
+                groups = inventory.get_group_ids(client, group_names)
+            else:
+                groups = get_group_ids(client, group_names)
+            host_ids = []
+            group_ids = list(groups.values())
+            output(f"Putting host groups '{', '.join(group_names)}' into maintenance.")
+
+        elif args.group:
+            group_names = [group.strip() for group in args.group.split(',')]
+            if inventory:
+                hosts = inventory.get_host_ids_by_groups(client, group_names)
+            else:
+                hosts = get_host_ids_by_groups(client, group_names)
+            host_ids = list(hosts.values())
+            output(f"Putting all hosts in groups '{', '.join(group_names)}' into maintenance.")
         
-        elif args.delete:
-            # Delete the specified maintenance tasks (comma-separated list)
-            maintenance_ids = [maintenance_id.strip() for maintenance_id in args.delete.split(',')]
-            deleted_ids = delete_maintenance_tasks(zabbix_url, headers, maintenance_ids)
-            print(f"Deleted maintenance task(s) with ID(s): {', '.join(deleted_ids)}")
-
-        elif args.time:
-            # Create maintenance based on hosts or groups
-            duration_seconds = parse_time_arg(args.time)
-
-            if args.group:
-                group_names = [group.strip() for group in args.group.split(',')]
-                hosts = get_host_ids_by_groups(zabbix_url, headers, group_names)
-                host_ids = list(hosts.values())
-                print(f"Putting all hosts in groups '{', '.join(group_names)}' into maintenance.")
-            
-            elif args.host == '*':
-                hosts = get_all_host_ids(zabbix_url, headers)
-                host_ids = list(hosts.values())
-                print("Putting all hosts into maintenance.")
-            
-            elif args.host:
-                host_names = args.host.split(',')
-                host_ids = [get_host_id(zabbix_url, headers, host_name.strip()) for host_name in host_names]
-            
+        elif args.host == '*':
+            if inventory:
+                hosts = inventory.get_all_host_ids()
             else:
-                raise Exception("You must specify either --host, --group, or * for all hosts.")
+                hosts = get_all_host_ids(client)
+            host_ids = list(hosts.values())
+            output("Putting all hosts into maintenance.")
+        
+        elif args.host or args.host_regex:
+            # Exact names keep the order given on the command line, patterns add their matches
+            hosts = resolve_host_ids(client, inventory, args.host, args.host_regex)
+            host_ids = list(hosts.values())
+            if args.host_regex or any(is_host_pattern(name) for name in split_names(args.host)):
+                output(f"Putting {len(host_ids)} matching host(s) into maintenance.")
+        
+        elif args.tag:
+            # The API filters on the tags and returns only host IDs
+            host_ids = get_host_ids_by_tags(client, args.tag, match=args.tag_match)
+            output(f"Putting {len(host_ids)} host(s) tagged {', '.join(args.tag)} into maintenance.")
+        
+        else:
+            raise Exception("You must specify either --host, --host-regex, --group, --tag, or * for all hosts.")
 
-            maintenance_id = create_maintenance(zabbix_url, headers, host_ids, duration_seconds)
-            print(f"Successfully created maintenance with ID: {maintenance_id}")
+        sharded = args.shard_size and len(host_ids) > args.shard_size and not group_ids
+        merged = None
+        if args.merge:
+            if sharded:
+                raise Exception("--merge cannot be used for sharded maintenances.")
+            merged = merge_maintenance(client, host_ids, duration_seconds, group_ids=group_ids)
 
+        if merged:
+            maintenance_id, end_time, extended = merged
+            end = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))
+            if extended:
+                output(f"Merged into maintenance {maintenance_id}, extended until {end}")
+            else:
+                output(f"Maintenance {maintenance_id} already covers these hosts until {end}")
+        elif sharded:
+            set_id, maintenance_ids = create_sharded_maintenance(client, host_ids, duration_seconds,
+                                                                 args.shard_size, concurrency=args.concurrency,
+                                                                 schedule=schedule)
+            output(f"Successfully created {args.every + ' ' if schedule else ''}maintenance set {set_id} with {len(maintenance_ids)} shard(s), ID(s): {', '.join(maintenance_ids)}")
         else:
-            raise Exception("You must specify either --list, --delete, or provide time for maintenance creation.")
+            maintenance_id = create_maintenance(client, host_ids, duration_seconds, group_ids=group_ids,
+                                                rename=not args.single_call, schedule=schedule)
+            output(f"Successfully created {args.every + ' ' if schedule else ''}maintenance with ID: {maintenance_id}")
+
+    elif args.refresh:
+        if not inventory:
+            raise Exception("No inventory cache to refresh, start the daemon with --cache.")
+        output(f"Inventory cache refreshed ({refreshed}): {inventory.path}")
+
+    else:
+        raise Exception("You must specify either --list, --delete, --purge-expired, --extend, --jobs, or provide time for maintenance creation.")
+
+# Function to name the command selected by the arguments, as used in daemon URLs
+def command_name(args):
+    if args.list:
+        return "list"
+    if args.delete:
+        return "delete"
+    if args.purge_expired:
+        return "purge-expired"
+    if args.extend:
+        return "extend"
+    if args.jobs:
+        return "jobs"
+    if args.time:
+        return "create"
+    if args.refresh:
+        return "refresh"
+    return None
+
+# Function to split a daemon address into a (host, port) pair, or None for a Unix socket path
+def parse_daemon_address(address):
+    host, _, port = address.rpartition(":")
+    if "/" in address or not port.isdigit():
+        return None
+    return host or "127.0.0.1", int(port)
+
+# Function to check whether a daemon host is a loopback address
+def is_loopback_address(host):
+    import ipaddress
+
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+# Function to remove the socket left behind by a daemon that is gone. Anything else at the path,
+# including the socket of a daemon that is still running, is left alone and reported.
+def remove_stale_socket(path):
+    import socket
+    import stat
+
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise Exception(f"{path} exists and is not a socket")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+
+    raise Exception(f"A daemon is already serving on {path}")
+
+# Function to create the daemon's HTTP server on a Unix socket path or host:port
+def make_daemon_server(address, daemon):
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # HTTP handler of the daemon: POST /<command> with a JSON object of DAEMON_OPTIONS runs the
+    # command, GET /status reports the warm state. Responses are {"output": [...], "error": ...}.
+    # A jobs file is read by the client and sent as "jobs_content", the daemon opens no client paths.
+    class DaemonHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/status":
+                self.send_json({"output": [], "error": f"Unknown path {self.path}"}, status=404)
+                return
+
+            daemon = self.server.daemon
+            self.send_json({
+                "zabbix_url": daemon['client'].zabbix_url,
+                "api_version": daemon['api_version'],
+                "json_codec": daemon['client'].json_codec,
+                "compress_requests": daemon['client'].compress_requests,
+                "uptime": round(time.time() - daemon['started_at']),
+                "inventory": daemon['inventory'].path if daemon['inventory'] else None,
+                "stats": daemon['client'].stats.as_dict()
+            })
+
+        def do_POST(self):
+            daemon = self.server.daemon
+            try:
+                options = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(options, dict):
+                    raise ValueError("Options must be a JSON object")
+                jobs_content = options.pop("jobs_content", None)
+                unknown = sorted(set(options) - set(DAEMON_OPTIONS))
+                if unknown:
+                    raise ValueError(f"Options not accepted by the daemon: {', '.join(unknown)}")
+
+                args = daemon['parser'].parse_args(daemon_argv(options))
+                for option in ("incremental", "max_sync_gap"):
+                    setattr(args, option, getattr(daemon['args'], option))
+                if args.jobs and not isinstance(jobs_content, str):
+                    raise ValueError("jobs needs the file content in jobs_content")
+                args.jobs_content = jobs_content
+                if command_name(args) != self.path.lstrip("/"):
+                    raise ValueError(f"Options do not describe a {self.path.lstrip('/')} command")
+            except ValueError as e:
+                self.send_json({"output": [], "error": str(e)}, status=400)
+                return
+
+            output = []
+            error = None
+            try:
+                run_command(args, daemon['client'], daemon['inventory'], output=output.append)
+            except Exception as e:
+                error = str(e)
+            self.send_json({"output": output, "error": error})
+
+        def log_message(self, format, *args):
+            pass
+
+    class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    tcp_address = parse_daemon_address(address)
+    if tcp_address:
+        # Requests are not authenticated and the daemon holds the API token, so TCP stays
+        # on loopback; the Unix socket is restricted to its owner instead
+        if not is_loopback_address(tcp_address[0]):
+            raise Exception(f"Refusing to serve on {address}: TCP is only served on loopback addresses, use a Unix socket for access control")
+        server = ThreadingHTTPServer(tcp_address, DaemonHandler)
+        server.daemon_threads = True
+    else:
+        if os.path.lexists(address):
+            remove_stale_socket(address)
+        server = UnixHTTPServer(address, DaemonHandler)
+        os.chmod(address, 0o600)
+
+    server.daemon = daemon
+    return server
+
+# Function to open an HTTP connection to the daemon on a Unix socket path or host:port
+def open_daemon_connection(address, timeout):
+    import http.client
+    import socket
+
+    # HTTP connection over a Unix socket
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        def __init__(self, socket_path, timeout):
+            super().__init__("localhost", timeout=timeout)
+            self.socket_path = socket_path
+
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.socket_path)
+
+    tcp_address = parse_daemon_address(address)
+    if tcp_address:
+        return http.client.HTTPConnection(*tcp_address, timeout=timeout)
+    return UnixHTTPConnection(address, timeout=timeout)
+
+# Function to run the daemon: one warm client, inventory cache and API version shared by all requests
+def serve_daemon(args):
+    import signal
+
+    zabbix_url, api_token = load_zabbix_config(args.config)
+    client = ZabbixClient(zabbix_url, api_token, pool_size=max(args.pool_size, args.concurrency),
+                          connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                          retries=args.retries,
+                          breaker=CircuitBreaker(args.breaker_threshold, args.breaker_timeout),
+                          json_codec=args.json_codec, compress_requests=args.compress_requests,
+                          call_log=log_call if args.log_calls else None)
+    inventory = None
+    if args.cache or args.refresh:
+        inventory = InventoryCache(zabbix_url, cache_dir=args.cache_dir, ttl=args.cache_ttl)
+        inventory.ensure_fresh(client, force=args.refresh, incremental=args.incremental, max_gap=args.max_sync_gap)
+
+    server = make_daemon_server(args.serve, {
+        "parser": build_parser(RequestParser),
+        "args": args,
+        "client": client,
+        "inventory": inventory,
+        "api_version": client.get_api_version(),
+        "started_at": time.time()
+    })
+    print(f"Serving maintenance commands on {args.serve} for {zabbix_url} (API {server.daemon['api_version']})", flush=True)
+
+    # Service managers stop the daemon with SIGTERM, leave through the cleanup below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not parse_daemon_address(args.serve) and os.path.exists(args.serve):
+            os.unlink(args.serve)
+        client.close()
+        if inventory:
+            inventory.close()
+
+# Function to send the command given on the command line to a daemon and print its output
+def call_daemon(parser, args):
+    command = command_name(args)
+    if command is None:
+        raise Exception("You must specify either --list, --delete, --purge-expired, --extend, --jobs, or provide time for maintenance creation.")
+
+    options = {option: getattr(args, option) for option in DAEMON_OPTIONS
+               if getattr(args, option) != parser.get_default(option)}
+
+    # The daemon does not open client paths, the jobs file is sent along
+    if args.jobs:
+        with open(args.jobs, newline="") as f:
+            options['jobs_content'] = f.read()
+
+    connection = open_daemon_connection(args.daemon, args.read_timeout)
+
+    try:
+        connection.request("POST", f"/{command}", body=json.dumps(options), headers={"Content-Type": "application/json"})
+        result = json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+    for line in result['output']:
+        print(line)
+    if result['error']:
+        raise Exception(result['error'])
+
+# Main function
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if not args.config and not args.daemon:
+        parser.error("--config is required unless --daemon is given")
+
+    if args.daemon:
+        try:
+            call_daemon(parser, args)
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+
+    if args.serve:
+        try:
+            serve_daemon(args)
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+
+    client = None
+    inventory = None
+    try:
+        # Reject a malformed --time or schedule before the HTTP stack is even imported
+        if args.time and not args.jobs:
+            parse_time_arg(args.time)
+        if args.every and not args.jobs:
+            build_schedule(args.every, args.at, args.on)
+
+        zabbix_url, api_token = load_zabbix_config(args.config)
+        client = ZabbixClient(zabbix_url, api_token, pool_size=max(args.pool_size, args.concurrency),
+                              connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                              retries=args.retries,
+                              breaker=CircuitBreaker(args.breaker_threshold, args.breaker_timeout),
+                              json_codec=args.json_codec, compress_requests=args.compress_requests,
+                              call_log=log_call if args.log_calls else None)
+
+        if args.cache or args.refresh:
+            inventory = InventoryCache(zabbix_url, cache_dir=args.cache_dir, ttl=args.cache_ttl)
+
+        run_command(args, client, inventory, output=lambda line: print(line, flush=True))
 
     except Exception as e:
         print(f"Error: {e}")
 
+    finally:
+        if client is not None:
+            client.close()
+            report_stats(args, client.stats)
+        if inventory is not None:
+            inventory.close()
+
 if __name__ == "__main__":
     main()